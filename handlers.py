@@ -16,6 +16,36 @@ if TYPE_CHECKING:
     from .main import DynamicButtonFrameworkPlugin
 
 
+def create_eager_task(
+    coro: Any, loop: Optional[asyncio.AbstractEventLoop] = None
+) -> asyncio.Task:
+    """
+    创建任务；在支持 eager_task_factory 的 Python（3.12+）上让协程立即同步执行到第一次真正挂起，
+    省去一次事件循环调度。只作用于本插件创建的任务，不修改全局的任务工厂。
+    """
+    if loop is None:
+        loop = asyncio.get_running_loop()
+    eager_factory = getattr(asyncio, "eager_task_factory", None)
+    if eager_factory is not None:
+        return eager_factory(loop, coro)
+    return loop.create_task(coro)
+
+
+# 后台任务的强引用集合：事件循环只持有任务的弱引用，未被引用的任务可能在执行途中被回收
+_background_tasks: "set[asyncio.Task]" = set()
+
+
+def spawn_background_task(
+    coro: Any, loop: Optional[asyncio.AbstractEventLoop] = None
+) -> asyncio.Task:
+    """以 create_eager_task 调度一个不等待结果的后台任务，并持有其引用直至完成。"""
+    task = create_eager_task(coro, loop)
+    if not task.done():
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    return task
+
+
 @dataclass
 class RedirectMetadata:
     """在重定向按钮回调中携带的上下文信息。"""
@@ -73,22 +103,17 @@ async def handle_callback_query(
             return
         data = redirect_meta.target_data
 
+    # 一次拆分得到回调类型（以对应的前缀常量表示）与载荷，替代逐个 startswith 比较
+    kind, ident = plugin.decode_callback_data(data)
     try:
-        if data.startswith(plugin.CALLBACK_PREFIX_COMMAND):
-            button_id = data[len(plugin.CALLBACK_PREFIX_COMMAND) :]
-            await handle_command_button(plugin, query, button_id)
-        elif data.startswith(plugin.CALLBACK_PREFIX_MENU):
-            menu_id = data[len(plugin.CALLBACK_PREFIX_MENU) :] or "root"
-            await handle_menu_navigation(plugin, query, menu_id)
-        elif data.startswith(plugin.CALLBACK_PREFIX_BACK):
-            menu_id = data[len(plugin.CALLBACK_PREFIX_BACK) :] or "root"
-            await handle_menu_navigation(plugin, query, menu_id)
-        elif data.startswith(plugin.CALLBACK_PREFIX_ACTION):
-            button_id = data[len(plugin.CALLBACK_PREFIX_ACTION) :]
-            await handle_action_button(plugin, query, button_id, redirect_meta)
-        elif data.startswith(plugin.CALLBACK_PREFIX_WORKFLOW):
-            button_id = data[len(plugin.CALLBACK_PREFIX_WORKFLOW) :]
-            await handle_workflow_button(plugin, query, button_id, redirect_meta)
+        if kind == plugin.CALLBACK_PREFIX_COMMAND:
+            await handle_command_button(plugin, query, ident)
+        elif kind == plugin.CALLBACK_PREFIX_MENU or kind == plugin.CALLBACK_PREFIX_BACK:
+            await handle_menu_navigation(plugin, query, ident or "root")
+        elif kind == plugin.CALLBACK_PREFIX_ACTION:
+            await handle_action_button(plugin, query, ident, redirect_meta)
+        elif kind == plugin.CALLBACK_PREFIX_WORKFLOW:
+            await handle_workflow_button(plugin, query, ident, redirect_meta)
         else:
             await query.answer()
     except Exception as exc:
@@ -99,7 +124,7 @@ async def handle_callback_query(
 async def handle_command_button(
     plugin: "DynamicButtonFrameworkPlugin", query: Any, button_id: str
 ) -> None:
-    snapshot = await plugin.button_store.get_snapshot()
+    snapshot = await plugin.button_store.get_shared_snapshot()
     button = snapshot.buttons.get(button_id)
     if not button:
         await query.answer("按钮已不存在。", show_alert=True)
@@ -117,7 +142,7 @@ async def handle_command_button(
 async def handle_menu_navigation(
     plugin: "DynamicButtonFrameworkPlugin", query: Any, target_menu_id: str
 ) -> None:
-    snapshot = await plugin.button_store.get_snapshot()
+    snapshot = await plugin.button_store.get_shared_snapshot()
     markup, header = plugin._build_menu_markup(target_menu_id or "root", snapshot)
     if not markup:
         await query.answer("目标菜单不存在。", show_alert=True)
@@ -164,7 +189,7 @@ async def _prepare_execution_context(
         await query.answer("按钮已不存在。", show_alert=True)
         return None
 
-    target_menu = plugin._find_menu_for_button(snapshot, button_id)
+    target_menu = snapshot.find_menu_for_button(button_id)
     if not target_menu:
         await query.answer("未找到按钮所属菜单。", show_alert=True)
         return None
@@ -210,7 +235,7 @@ async def _prepare_execution_context(
     if redirect_meta and redirect_meta.source_menu_id:
         source_menu = snapshot.menus.get(redirect_meta.source_menu_id)
     if not source_menu and source_button_id:
-        source_menu = plugin._find_menu_for_button(snapshot, source_button_id)
+        source_menu = snapshot.find_menu_for_button(source_button_id)
 
     locate_target_menu = redirect_meta.locate_target_menu if redirect_meta else False
 
@@ -375,7 +400,7 @@ async def _handle_executable_button(
                 plugin.logger.error(f"无法发送后台错误通知: {inner_exc}")
 
     # 将耗时的操作调度为后台任务
-    asyncio.create_task(execute_and_process())
+    spawn_background_task(execute_and_process())
 
 
 async def _process_execution_result(
@@ -475,7 +500,7 @@ async def _process_execution_result(
             plugin.logger.warning("无法确定用于更新的菜单 ID。")
             return
 
-        next_snapshot = await plugin.button_store.get_snapshot()
+        next_snapshot = await plugin.button_store.get_shared_snapshot()
         menu_for_overrides = None
         if target_menu_id:
             menu_for_overrides = next_snapshot.menus.get(target_menu_id)
@@ -1,140 +1,389 @@
 # local_actions/send_message.py
 
-from typing import TYPE_CHECKING, Dict, Any, Optional
+import asyncio
+import os
+import time
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
+
+try:
+    from telegram import InputFile
+    from telegram.error import NetworkError, RetryAfter
+except ImportError:  # 可选依赖
+    InputFile = None
+    NetworkError = None
+    RetryAfter = None
+
+# 网络抖动、超时（TimedOut 是 NetworkError 的子类）与限流属于可预期的瞬时错误，
+# 记录时不附带堆栈，避免在网络不稳定时反复格式化 traceback
+_TRANSIENT_ERRORS = tuple(exc for exc in (NetworkError, RetryAfter) if exc is not None)
 
 if TYPE_CHECKING:
     from ..main import DynamicButtonFrameworkPlugin
 
+# 解析模式别名 -> Telegram parse_mode，None 表示不解析；未知值回退为 HTML
+_PARSE_MODE_MAP: Dict[str, Optional[str]] = {
+    "": None,
+    "none": None,
+    "plain": None,
+    "text": None,
+    "plaintext": None,
+    "markdownv2": "MarkdownV2",
+    "mdv2": "MarkdownV2",
+    "markdown": "Markdown",
+    "md": "Markdown",
+    "html": "HTML",
+}
+
+
+def _map_parse_mode(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return "HTML"
+    return _PARSE_MODE_MAP.get(str(value).strip().lower(), "HTML")
+
+
+class TokenBucket:
+    """协程安全的令牌桶，在调用 Telegram 发送接口前进行客户端限速。"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = float(burst)
+        self._tokens = float(burst)
+        # 令牌从该时间点开始补充；被 429 暂停时会被推到未来
+        self._updated = time.monotonic()
+        # 每次 drain 递增，暂停前做出的预约据此作废
+        self._epoch = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_idle(self) -> bool:
+        """令牌已回满且未被暂停时，该桶与新建的桶等价。"""
+        now = time.monotonic()
+        if now < self._updated:
+            return False
+        refilled = self._tokens + (now - self._updated) * self.rate
+        return refilled >= self.capacity
+
+    async def acquire(self) -> None:
+        # 预约式发放：在锁内结算并预扣一个令牌（令牌可为负数，表示已被预约），
+        # 按先来后到算出各自的等待时间后在锁外睡眠，等待者不会占着锁让后来者排队
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                if now > self._updated:
+                    self._tokens = min(
+                        self.capacity,
+                        self._tokens + (now - self._updated) * self.rate,
+                    )
+                    self._updated = now
+                self._tokens -= 1
+                wait = (self._updated - now) + max(0.0, -self._tokens) / self.rate
+                epoch = self._epoch
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if epoch == self._epoch:
+                return
+            # 等待期间桶因 429 被暂停，之前的预约已作废，重新排队
+
+    def drain(self, seconds: float) -> None:
+        """清空令牌并在 seconds 秒内暂停发放（用于响应 429 RetryAfter）。"""
+        self._tokens = 0.0
+        self._updated = max(self._updated, time.monotonic() + seconds)
+        self._epoch += 1
+
+
+# Telegram 限制：全局约 30 条/秒，同一群组/频道约 20 条/分钟，同一私聊约 1 条/秒
+_global_bucket = TokenBucket(rate=25, burst=30)
+_chat_buckets: Dict[str, TokenBucket] = {}
+_MAX_CHAT_BUCKETS = 1024
+
+
+def _is_group_chat(chat_id: str) -> bool:
+    """群组/频道的数字 ID 以 "-" 开头，公开频道或群组也可用 "@用户名" 指定。"""
+    return str(chat_id).startswith(("-", "@"))
+
+
+def _get_chat_bucket(chat_id: str) -> TokenBucket:
+    key = str(chat_id)
+    bucket = _chat_buckets.get(key)
+    if bucket is None:
+        if len(_chat_buckets) >= _MAX_CHAT_BUCKETS:
+            # 回收已回满的桶，避免字典无限增长
+            for idle_key in [k for k, b in _chat_buckets.items() if b.is_idle]:
+                del _chat_buckets[idle_key]
+        if _is_group_chat(key):
+            bucket = TokenBucket(rate=20 / 60, burst=20)
+        else:
+            bucket = TokenBucket(rate=1, burst=1)
+        _chat_buckets[key] = bucket
+    return bucket
+
+
+async def _acquire_send_slot(chat_id: str) -> None:
+    # 先等待聊天自身的桶，再取全局令牌：被限速的群组不会提前占用全局令牌而白白浪费
+    # 私聊平时不限速，只有在收到 429 后才会建立桶，此时同样需要等待
+    if _is_group_chat(chat_id):
+        bucket: Optional[TokenBucket] = _get_chat_bucket(chat_id)
+    else:
+        bucket = _chat_buckets.get(str(chat_id))
+    if bucket is not None:
+        await bucket.acquire()
+    await _global_bucket.acquire()
+
+
+def _apply_retry_after(chat_id: str, exc: Exception) -> None:
+    if RetryAfter is None or not isinstance(exc, RetryAfter):
+        return
+    retry_after = exc.retry_after
+    seconds = (
+        retry_after.total_seconds()
+        if hasattr(retry_after, "total_seconds")
+        else float(retry_after)
+    )
+    # 429 来自向单个聊天的发送，只暂停该聊天，不影响发往其他聊天的消息
+    _get_chat_bucket(chat_id).drain(seconds)
+
+
+def _parse_chat_ids(raw_value: Any) -> List[str]:
+    if not raw_value:
+        return []
+    if isinstance(raw_value, (list, tuple)):
+        items = raw_value
+    else:
+        items = str(raw_value).replace("\r", "\n").replace(",", "\n").split("\n")
+    return [str(item).strip() for item in items if str(item).strip()]
+
+
 # --- 动作元数据 (新版) ---
-ACTION_METADATA = {
-    "id": "send_message",
-    "name": "发送新消息",
-    "description": "立即发送一条全新的消息，并输出 message_id。可包含文本和单个媒体文件（图片或语音）。",
-    "inputs": [
+_INPUTS = (
+    MappingProxyType(
         {
             "name": "text",
             "type": "string",
             "required": False,
             "description": "要发送的文本内容。可以与图片或语音一起作为说明文字发送。",
-        },
+        }
+    ),
+    MappingProxyType(
         {
             "name": "image_source",
             "type": "string",
             "required": False,
             "description": "要发送的图片的**本地文件路径**。请与 `cache_from_url` 动作配合使用来下载网络图片。",
-        },
+        }
+    ),
+    MappingProxyType(
         {
             "name": "voice_source",
             "type": "string",
             "required": False,
             "description": "要发送的语音的**本地文件路径**。通常来自 `cache_from_url` 动作的输出。",
-        },
+        }
+    ),
+    MappingProxyType(
         {
             "name": "chat_id",
             "type": "string",
-            "required": True,
+            "required": False,
             "description": "要发送到的目标聊天 ID。通常从工作流的运行时变量 `runtime.chat_id` 获取。",
-        },
+        }
+    ),
+    MappingProxyType(
+        {
+            "name": "chat_ids",
+            "type": "string",
+            "required": False,
+            "description": "批量发送的目标聊天 ID 列表（换行或逗号分隔）。填写后将并发发送到所有目标，并忽略 `chat_id`。",
+        }
+    ),
+    MappingProxyType(
         {
             "name": "parse_mode",
             "type": "string",
             "required": False,
             "default": "html",
             "description": "选择文本解析模式以匹配 Telegram 对 HTML/Markdown 的支持，或选择纯文本不解析。",
-            "enum": ["html", "markdown", "markdownv2", "plain"],
+            "enum": ("html", "markdown", "markdownv2", "plain"),
             "enum_labels": {
                 "html": "HTML（默认）",
                 "markdown": "Markdown",
                 "markdownv2": "MarkdownV2",
                 "plain": "纯文本（不解析）",
             },
-        },
-    ],
-    "outputs": [
+        }
+    ),
+)
+_OUTPUTS = (
+    MappingProxyType(
         {
             "name": "message_id",
             "type": "integer",
-            "description": "成功发送后，新消息的唯一ID。",
+            "description": "成功发送后，新消息的唯一ID（批量发送时为第一条成功消息的ID）。",
         }
-    ],
-}
+    ),
+    MappingProxyType(
+        {
+            "name": "message_ids",
+            "type": "any",
+            "description": "批量发送时，按 chat_ids 顺序排列的消息ID列表，发送失败的目标对应 null。",
+        }
+    ),
+    MappingProxyType(
+        {
+            "name": "failed_chat_ids",
+            "type": "any",
+            "description": "批量发送时，发送失败的目标聊天ID列表；全部成功时为空列表。",
+        }
+    ),
+)
+
+ACTION_METADATA = MappingProxyType(
+    {
+        "id": "send_message",
+        "name": "发送新消息",
+        "description": "立即发送一条全新的消息，并输出 message_id。可包含文本和单个媒体文件（图片或语音）。",
+        "inputs": _INPUTS,
+        "outputs": _OUTPUTS,
+    }
+)
+
+
+# Bot API 上传文件的大小上限
+_TELEGRAM_UPLOAD_LIMIT = 50 * 1024 * 1024
 
 
 # --- 动作执行逻辑---
+def _load_media(path: str) -> Any:
+    """
+    同步读取媒体文件（在工作线程中调用），保留文件名以便 Telegram 推断类型。
+    超过上传上限的文件必然发送失败，先检查大小，避免把整个文件读入内存。
+    """
+    with open(path, "rb") as media_file:
+        size = os.fstat(media_file.fileno()).st_size
+        if size > _TELEGRAM_UPLOAD_LIMIT:
+            raise ValueError(
+                f"媒体文件过大（{size} 字节），超过 Telegram 上传上限 "
+                f"{_TELEGRAM_UPLOAD_LIMIT // (1024 * 1024)} MB: {path}"
+            )
+        data = media_file.read()
+    if InputFile is None:
+        return data
+    return InputFile(data, filename=os.path.basename(path))
+
+
+async def _send_to_chat(
+    client: Any, method: str, target_chat_id: str, send_kwargs: Dict[str, Any]
+) -> Any:
+    """在限速器许可下向单个聊天发送消息。"""
+    await _acquire_send_slot(target_chat_id)
+    try:
+        return await getattr(client, method)(chat_id=target_chat_id, **send_kwargs)
+    except Exception as e:
+        _apply_retry_after(target_chat_id, e)
+        raise
+
+
 async def execute(
     plugin: "DynamicButtonFrameworkPlugin",
-    chat_id: str,
+    chat_id: str = None,
     text: str = None,
     image_source: str = None,
     voice_source: str = None,
     parse_mode: str = "html",
+    chat_ids: Any = None,
 ) -> Dict[str, Any]:
     """
     【已重构】立即执行发送消息的操作，并返回 message_id。
+    提供 chat_ids 时会在限速器约束下并发发送到所有目标。
     """
     # 1. 获取 Telegram 客户端
-    client = plugin._get_telegram_client()
+    client = plugin.telegram_client
     if not client:
         # 在真实执行环境中，最好是通过抛出异常来中断工作流，但这里为了简单，返回一个错误指示
         # 注意：ActionExecutor 会捕获这个异常并报告错误
         raise RuntimeError("无法获取 Telegram 客户端实例。")
 
-    def _map_parse_mode(value: str) -> Optional[str]:
-        if not value:
-            return "HTML"
-        lowered = str(value).strip().lower()
-        if lowered in {"", "none", "plain", "text", "plaintext"}:
-            return None
-        if lowered in {"markdownv2", "mdv2"}:
-            return "MarkdownV2"
-        if lowered in {"markdown", "md"}:
-            return "Markdown"
-        return "HTML"
+    targets = _parse_chat_ids(chat_ids)
+    if not targets:
+        if not chat_id:
+            raise ValueError("必须提供 chat_id 或 chat_ids。")
+        targets = [str(chat_id)]
 
     # 2. 准备消息内容
     caption = text or ""
-    sent_message = None
     telegram_parse_mode = _map_parse_mode(parse_mode)
 
+    if image_source:
+        method, media_key, media_path = "send_photo", "photo", image_source
+    elif voice_source:
+        method, media_key, media_path = "send_voice", "voice", voice_source
+    elif caption:
+        method, media_key, media_path = "send_message", None, None
+    else:
+        # 没有发送任何内容，可以选择静默返回或报错
+        return {}  # 返回空字典，表示没有输出
+
+    # 三种发送方式共用同一份参数布局：文本消息用 text，媒体消息用 caption
+    send_kwargs: Dict[str, Any] = {"caption" if media_key else "text": caption}
+    if telegram_parse_mode:
+        send_kwargs["parse_mode"] = telegram_parse_mode
+
     # 3. 根据内容调用不同的 API
     try:
-        if image_source:
-            with open(image_source, "rb") as photo_payload:
-                send_kwargs: Dict[str, Any] = {
-                    "chat_id": chat_id,
-                    "photo": photo_payload,
-                    "caption": caption,
-                }
-                if telegram_parse_mode:
-                    send_kwargs["parse_mode"] = telegram_parse_mode
-                sent_message = await client.send_photo(**send_kwargs)
-        elif voice_source:
-            with open(voice_source, "rb") as voice_payload:
-                send_kwargs = {
-                    "chat_id": chat_id,
-                    "voice": voice_payload,
-                    "caption": caption,
-                }
-                if telegram_parse_mode:
-                    send_kwargs["parse_mode"] = telegram_parse_mode
-                sent_message = await client.send_voice(**send_kwargs)
-        elif caption:
-            send_kwargs = {"chat_id": chat_id, "text": caption}
-            if telegram_parse_mode:
-                send_kwargs["parse_mode"] = telegram_parse_mode
-            sent_message = await client.send_message(**send_kwargs)
+        if media_key:
+            # 在线程中读取文件，避免大文件的磁盘 IO 阻塞事件循环；
+            # python-telegram-bot 上传时本就会把 InputFile 整体读入内存，批量发送时也可共享同一份数据
+            send_kwargs[media_key] = await asyncio.to_thread(_load_media, media_path)
+        if len(targets) == 1:
+            sent_messages = [
+                await _send_to_chat(client, method, targets[0], send_kwargs)
+            ]
         else:
-            # 没有发送任何内容，可以选择静默返回或报错
-            return {}  # 返回空字典，表示没有输出
-
+            # 所有目标共享同一个只读的 send_kwargs，chat_id 在 _send_to_chat 中单独传入
+            sent_messages = await asyncio.gather(
+                *(
+                    _send_to_chat(client, method, target, send_kwargs)
+                    for target in targets
+                ),
+                return_exceptions=True,
+            )
+    except _TRANSIENT_ERRORS as e:
+        plugin.logger.warning("发送消息时出现瞬时错误: %s: %s", type(e).__name__, e)
+        raise RuntimeError(f"调用 Telegram API 发送消息失败: {e}") from e
     except Exception as e:
-        plugin.logger.error(f"发送消息时出错: {e}", exc_info=True)
-        raise RuntimeError(f"调用 Telegram API 发送消息失败: {e}")
+        plugin.logger.error("发送消息时出错: %s", e, exc_info=True)
+        raise RuntimeError(f"调用 Telegram API 发送消息失败: {e}") from e
 
     # 4. 如果发送成功，提取并返回 message_id
-    if sent_message and hasattr(sent_message, "message_id"):
-        message_id = sent_message.message_id
-        # 按新规范，将输出变量直接放在返回字典的顶层
-        return {"message_id": message_id}
+    # message_ids 与 targets 一一对应，失败的目标记为 None，便于工作流按位置对应目标
+    message_ids: List[Any] = []
+    failed_chat_ids: List[str] = []
+    errors: List[str] = []
+    # gather 按参数顺序返回结果，按下标对应目标，数量不一致时直接抛出 IndexError
+    for index, target in enumerate(targets):
+        sent_message = sent_messages[index]
+        if isinstance(sent_message, Exception):
+            if isinstance(sent_message, _TRANSIENT_ERRORS):
+                plugin.logger.warning(
+                    "向 %s 发送消息时出现瞬时错误: %s", target, sent_message
+                )
+            else:
+                plugin.logger.error("向 %s 发送消息时出错: %s", target, sent_message)
+            errors.append(f"{target}: {sent_message}")
+            failed_chat_ids.append(target)
+            message_ids.append(None)
+        else:
+            message_ids.append(getattr(sent_message, "message_id", None))
+
+    first_message_id = next((mid for mid in message_ids if mid is not None), None)
+    if errors and first_message_id is None:
+        raise RuntimeError(f"调用 Telegram API 发送消息失败: {'; '.join(errors)}")
+    if first_message_id is None:
+        return {}
 
-    return {}
+    # 按新规范，将输出变量直接放在返回字典的顶层
+    result: Dict[str, Any] = {"message_id": first_message_id}
+    if len(targets) > 1:
+        result["message_ids"] = message_ids
+        result["failed_chat_ids"] = failed_chat_ids
+    return result
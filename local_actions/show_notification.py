@@ -1,24 +1,35 @@
+from types import MappingProxyType
+
 # ACTION_METADATA 用于在 UI 中定义动作的属性
-ACTION_METADATA = {
-    "id": "show_notification",
-    "name": "显示弹窗通知",
-    "description": "在 Telegram 客户端顶部显示一个短暂的弹窗通知。适用于简短的、非阻塞的反馈。",
-    "inputs": [
+# 元数据在导入时构建一次并冻结，注册表与 WebUI 可以直接按引用共享
+_INPUTS = (
+    MappingProxyType(
         {
             "name": "text",
             "type": "string",
             "description": "要显示的通知内容。",
             "default": "操作成功",
-        },
+        }
+    ),
+    MappingProxyType(
         {
             "name": "show_alert",
             "type": "boolean",
             "description": "是否使用会强制用户确认的‘警报’样式。默认为否（短暂通知）。",
             "default": False,
-        },
-    ],
-    "outputs": [],
-}
+        }
+    ),
+)
+
+ACTION_METADATA = MappingProxyType(
+    {
+        "id": "show_notification",
+        "name": "显示弹窗通知",
+        "description": "在 Telegram 客户端顶部显示一个短暂的弹窗通知。适用于简短的、非阻塞的反馈。",
+        "inputs": _INPUTS,
+        "outputs": (),
+    }
+)
 
 
 async def execute(text: str, show_alert: bool = False):
@@ -26,7 +37,11 @@ async def execute(text: str, show_alert: bool = False):
     执行显示通知的动作。
     主插件会拦截返回字典中的 'notification' 键并处理。
     """
-    if not isinstance(text, str):
-        text = str(text)
-
-    return {"notification": {"text": text, "show_alert": bool(show_alert)}}
+    # 每次按钮回调都会触发，直接构建一次返回值；
+    # 内层字典交由执行器在工作流间传递，必须是新对象，不能复用共享模板
+    return {
+        "notification": {
+            "text": text if type(text) is str else str(text),
+            "show_alert": show_alert if type(show_alert) is bool else bool(show_alert),
+        }
+    }
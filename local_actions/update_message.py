@@ -1,38 +1,62 @@
-ACTION_METADATA = {
-    "id": "update_message",
-    "name": "更新菜单标题",
-    "description": "使用输入的文本更新当前菜单的标题文本。",
-    "inputs": [
-        {"name": "text", "type": "string", "description": "要显示的新的菜单标题。"},
+from types import MappingProxyType
+
+# 解析模式选项在模块加载时构建一次，元数据中的 enum 与 enum_labels 共用同一份定义
+PARSE_MODE_LABELS = {
+    "html": "HTML（默认）",
+    "markdown": "Markdown",
+    "markdownv2": "MarkdownV2",
+    "plain": "纯文本（不解析）",
+}
+PARSE_MODE_OPTIONS = tuple(PARSE_MODE_LABELS)
+DEFAULT_PARSE_MODE = PARSE_MODE_OPTIONS[0]
+
+# 别名 -> 规范解析模式；未列出的值统一回退为默认的 html
+PARSE_MODE_ALIASES = {
+    **{option: option for option in PARSE_MODE_OPTIONS},
+    "": "plain",
+    "none": "plain",
+    "text": "plain",
+    "plaintext": "plain",
+    "md": "markdown",
+    "mdv2": "markdownv2",
+}
+
+_INPUTS = (
+    MappingProxyType(
+        {"name": "text", "type": "string", "description": "要显示的新的菜单标题。"}
+    ),
+    MappingProxyType(
         {
             "name": "parse_mode",
             "type": "string",
             "required": False,
-            "default": "html",
+            "default": DEFAULT_PARSE_MODE,
             "description": "设置菜单标题文本的解析模式。",
-            "enum": ["html", "markdown", "markdownv2", "plain"],
-            "enum_labels": {
-                "html": "HTML（默认）",
-                "markdown": "Markdown",
-                "markdownv2": "MarkdownV2",
-                "plain": "纯文本（不解析）",
-            },
-        },
-    ],
-    "outputs": [],
-}
+            "enum": PARSE_MODE_OPTIONS,
+            "enum_labels": PARSE_MODE_LABELS,
+        }
+    ),
+)
+
+ACTION_METADATA = MappingProxyType(
+    {
+        "id": "update_message",
+        "name": "更新菜单标题",
+        "description": "使用输入的文本更新当前菜单的标题文本。",
+        "inputs": _INPUTS,
+        "outputs": (),
+    }
+)
 
 
 async def execute(text: str, parse_mode: str = "html") -> dict:
     """将输入的文本作为 new_text 返回以更新菜单标题。"""
-    normalized = str(parse_mode or "html").strip().lower()
-    if normalized in {"", "none", "plain", "text", "plaintext"}:
-        normalized = "plain"
-    elif normalized in {"markdown", "md"}:
-        normalized = "markdown"
-    elif normalized in {"markdownv2", "mdv2"}:
-        normalized = "markdownv2"
+    if not parse_mode or parse_mode == DEFAULT_PARSE_MODE:
+        # 绝大多数调用直接使用默认值，无需再做规范化
+        normalized = DEFAULT_PARSE_MODE
     else:
-        normalized = "html"
+        normalized = PARSE_MODE_ALIASES.get(
+            str(parse_mode).strip().lower(), DEFAULT_PARSE_MODE
+        )
 
     return {"new_text": text, "parse_mode": normalized}
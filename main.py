@@ -7,12 +7,27 @@ AstrBot 动态按钮框架的核心插件文件。
 import asyncio
 import html
 import hashlib
+import json
+import mmap
 import os
-import re
 import shutil
 import time
+from bisect import insort
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from types import MappingProxyType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
 
 from astrbot.api import logger, AstrBotConfig
 from astrbot.api.event import AstrMessageEvent, filter
@@ -55,18 +70,33 @@ from .storage import (
     ButtonDefinition,
     MenuDefinition,
     WebAppDefinition,
+    _SLOTS,
 )
 from .modular_actions import ModularActionRegistry
 
+if TYPE_CHECKING:
+    # WebUI（及其依赖的 aiohttp）仅在启用时才于 _ensure_webui 中导入
+    from .webui import WebUIServer
+
 
-@dataclass
+@dataclass(frozen=True, **_SLOTS)
 class RegisteredAction:
-    """表示一个由插件注册的自定义动作。"""
+    """表示一个由插件注册的自定义动作。注册后不可修改，parameters 为只读映射。"""
 
     name: str
     function: Callable
     description: str
-    parameters: Dict[str, Any]
+    parameters: Mapping[str, Any]
+
+
+@dataclass(**_SLOTS)
+class _TelegramEventContext:
+    """构造模拟事件所需的平台信息，按 (platform, client) 缓存，避免每次回调都调用 meta()。"""
+
+    platform: Any
+    client: Any
+    platform_meta: Any
+    self_id: str
 
 
 class ActionRegistry:
@@ -82,7 +112,10 @@ class ActionRegistry:
         if name in self._actions:
             self.logger.warning(f"本地动作 '{name}' 已存在，无法重复注册。")
             return False
-        self._actions[name] = RegisteredAction(name, function, description, params)
+        # 复制一份再包装为只读映射，调用方之后修改自己的字典不会影响已注册的动作
+        self._actions[name] = RegisteredAction(
+            name, function, description, MappingProxyType(dict(params or {}))
+        )
         self.logger.info(f"成功注册本地动作: '{name}'")
         return True
 
@@ -113,27 +146,332 @@ class TgButtonApi:
         self._registry.register(name, function, description, params)
 
 
-from .webui import WebUIServer
-
 BACK_BUTTON_TEXT = "返回"
+TELEGRAM_PLATFORM_CACHE_TTL = 2.0  # Telegram 平台查找结果的复用时长（秒）
+MARKUP_CACHE_MAX_ENTRIES = 256  # 单个修订号下最多缓存的菜单键盘数量
+CALLBACK_DATA_CACHE_MAX_ENTRIES = 4096  # 回调数据字符串缓存的上限
+MAX_BUCKET_ROW = 1024  # 行号不超过该值时按列表桶分行，否则回退为排序
+CALLBACK_WORKER_IDLE_TIMEOUT = 60.0  # 会话回调队列空闲超过该时长（秒）后回收其工作任务
+
+# 不带覆盖参数渲染时共用的只读空映射，避免每次渲染新建 {}
+_EMPTY_OVERRIDES: Mapping[str, Dict[str, Any]] = MappingProxyType({})
+
+# 等待输入时用于把 Markdown 提示文本清理成按钮标题的删除表
+_MD_STRIP = str.maketrans("", "", "*_`~")
+_MDV2_STRIP = str.maketrans("", "", '*_`~\\[]()>"')
+
+
+def _callback_chat_key(update: Any) -> str:
+    """计算回调所属的会话键：聊天 ID 加话题 ID；内联消息的回调按用户区分。"""
+    query = getattr(update, "callback_query", None)
+    message = getattr(query, "message", None)
+    chat = getattr(message, "chat", None)
+    if chat is not None:
+        thread_id = getattr(message, "message_thread_id", None)
+        return f"{chat.id}#{thread_id}" if thread_id else str(chat.id)
+    user = getattr(query, "from_user", None)
+    return f"user:{getattr(user, 'id', '')}"
+
+
+@lru_cache(maxsize=4096)
+def _split_chat_id_cached(chat_id_str: str) -> Tuple[str, Optional[int]]:
+    """把 "会话ID#话题ID" 拆为 (会话ID, 话题ID)；同一会话会反复触发回调，按原始字符串缓存结果。"""
+    sep = chat_id_str.find("#")
+    if sep < 0:
+        return chat_id_str, None
+    # 话题部分按 int() 的规则解析（允许前后空白、正负号、下划线分隔），无法解析时丢弃
+    try:
+        thread_id: Optional[int] = int(chat_id_str[sep + 1 :])
+    except ValueError:
+        thread_id = None
+    return chat_id_str[:sep], thread_id
+
+
+def _strip_html(text: str) -> str:
+    """
+    去除 HTML 标签并解码实体，结果与 html.unescape(re.sub(r"<[^>]+>", "", text)) 一致。
+    借助 str.find 按标签边界切片拼接，只扫描一遍原文；实体解码交给 html.unescape（无 "&" 时直接返回）。
+    """
+    parts: List[str] = []
+    start = 0
+    while (lt := text.find("<", start)) >= 0:
+        gt = text.find(">", lt + 1)
+        if gt < 0:
+            break  # 之后再无 ">"，剩余部分都不构成标签
+        if gt == lt + 1:
+            # "<>" 不是标签，保留 "<" 并从下一个字符继续查找
+            parts.append(text[start : lt + 1])
+            start = lt + 1
+        else:
+            parts.append(text[start:lt])
+            start = gt + 1
+    if parts:
+        parts.append(text[start:])
+        text = "".join(parts)
+    return html.unescape(text)
+
+
+# 等待用户输入时需要读取的运行时上下文字段
+_RUNTIME_FIELDS = (
+    "chat_id",
+    "chat_type",
+    "message_id",
+    "thread_id",
+    "user_id",
+    "username",
+    "full_name",
+    "callback_data",
+    "variables",
+)
+
+
+def _runtime_fields(runtime: Any) -> Dict[str, Any]:
+    """
+    一次性取出运行时上下文的字段。
+    普通对象直接复用其 __dict__；没有 __dict__ 的对象（如使用 __slots__）回退为逐个 getattr。
+    """
+    fields = getattr(runtime, "__dict__", None)
+    if fields is None:
+        fields = {name: getattr(runtime, name, None) for name in _RUNTIME_FIELDS}
+    return fields
+
+
+def _resolve_target_by_id(
+    snapshot: ButtonsModel, _menu: MenuDefinition, candidate: str
+) -> List[str]:
+    return [candidate] if candidate in snapshot.buttons else []
+
+
+def _resolve_target_by_index(
+    snapshot: ButtonsModel, menu: MenuDefinition, raw_index: str
+) -> Optional[List[str]]:
+    try:
+        idx = int(raw_index)
+    except ValueError:
+        return []
+    if 0 <= idx < len(menu.items):
+        candidate = menu.items[idx]
+        return [candidate] if candidate in snapshot.buttons else []
+    return None  # 越界时与直接按 ID 匹配的回退逻辑保持一致
+
+
+# 覆盖目标 "<前缀>:<值>" 的解析函数；返回 None 表示回退为按完整字符串匹配按钮 ID
+_OVERRIDE_TARGET_RESOLVERS: Dict[
+    str, Callable[[ButtonsModel, MenuDefinition, str], Optional[List[str]]]
+] = {
+    "id": _resolve_target_by_id,
+    "button": _resolve_target_by_id,
+    "index": _resolve_target_by_index,
+}
+
+# 已编译的覆盖目标：给定 (快照, 菜单, 当前按钮 ID) 返回目标按钮 ID 列表
+OverrideTargetPlan = Callable[[ButtonsModel, MenuDefinition, str], List[str]]
+
+
+def _resolve_self_target(
+    snapshot: ButtonsModel, _menu: MenuDefinition, current_button_id: str
+) -> List[str]:
+    return [current_button_id] if current_button_id in snapshot.buttons else []
+
+
+@lru_cache(maxsize=512)
+def _compile_override_target(target: str) -> OverrideTargetPlan:
+    """
+    把覆盖目标字符串预先解析为解析函数。覆盖条目在每次动作执行时才渲染出来，
+    无法在快照加载时编译，但目标字符串高度重复（"self"、"index:0" 等），按字符串缓存即可。
+    """
+    if not target:
+        target = "self"
+    prefix, sep, rest = target.partition(":")
+    resolver = _OVERRIDE_TARGET_RESOLVERS.get(prefix.lower()) if sep else None
+    if resolver is None:
+        if not sep and prefix.lower() == "self":
+            return _resolve_self_target
+
+        def _resolve_literal(
+            snapshot: ButtonsModel, _menu: MenuDefinition, _current: str
+        ) -> List[str]:
+            return [target] if target in snapshot.buttons else []
+
+        return _resolve_literal
+
+    def _resolve_prefixed(
+        snapshot: ButtonsModel, menu: MenuDefinition, _current: str
+    ) -> List[str]:
+        resolved = resolver(snapshot, menu, rest)
+        if resolved is None:
+            return [target] if target in snapshot.buttons else []
+        return resolved
+
+    return _resolve_prefixed
 
 
 def get_plugin_data_path() -> Path:
     return StarTools.get_data_dir(PLUGIN_NAME)
 
 
+SMALL_FILE_COMPARE_SIZE = 4096  # 小于该大小的文件直接比较字节，无需计算哈希
+
+
+# hashlib.file_digest 仅在 Python 3.11+ 可用
+_file_digest = getattr(hashlib, "file_digest", None)
+
+
+def _new_file_hasher() -> Any:
+    # 仅用于判断文件是否变化，不涉及安全边界，使用更快的 BLAKE2b（128 位摘要）
+    return hashlib.blake2b(digest_size=16)
+
+
+@lru_cache(maxsize=1024)
+def _hash_file_contents(path: str, mtime_ns: int, size: int) -> str:
+    """
+    按 (路径, 修改时间, 大小) 缓存的文件哈希计算。
+    mtime_ns 与 size 仅作为缓存键，文件未变化时重载插件可直接命中缓存而无需重新读取。
+    """
+    with open(path, "rb") as f:
+        if _file_digest is not None:
+            # Python 3.11+：读取与哈希循环都在 C 中完成，并在阻塞读时释放 GIL
+            return _file_digest(f, _new_file_hasher).hexdigest()
+        digest = _new_file_hasher()
+        if size:
+            # 旧版本回退：通过 mmap 一次性交给 hashlib，省去逐块读取的 Python 循环
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+        return digest.hexdigest()
+
+
 def _get_file_hash(path: Path) -> str:
-    """计算文件的 SHA256 哈希值。"""
-    sha256 = hashlib.sha256()
+    """计算文件内容的哈希值，用于比较预设动作文件是否一致。"""
     try:
-        with open(path, "rb") as f:
-            while chunk := f.read(8192):
-                sha256.update(chunk)
-        return sha256.hexdigest()
+        st = path.stat()
+        return _hash_file_contents(str(path), st.st_mtime_ns, st.st_size)
     except IOError:
         return ""
 
 
+def _files_equal(first: Path, second: Path, size: int) -> bool:
+    """比较两个大小相同的文件内容：小文件直接比较字节，大文件比较哈希。"""
+    if size < SMALL_FILE_COMPARE_SIZE:
+        return first.read_bytes() == second.read_bytes()
+    return _get_file_hash(first) == _get_file_hash(second)
+
+
+PRESET_SYNC_CONCURRENCY = 8  # 同步预设动作文件时的最大并发线程数
+PRESET_SYNC_MANIFEST = ".sync_manifest.json"  # 记录上次同步时源文件元数据的清单
+
+
+def _load_sync_manifest(path: Path) -> Dict[str, List[Any]]:
+    """
+    读取同步清单（文件名 -> [源文件 mtime_ns, 源文件大小, 内容哈希, 目标文件 mtime_ns, 目标文件大小]）；
+    缺失或损坏时视为空清单。
+    """
+    try:
+        data = json.loads(path.read_bytes())
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _save_sync_manifest(path: Path, manifest: Dict[str, List[Any]]) -> None:
+    """先写入临时文件再原子替换，避免中途失败留下半截清单。"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+PresetSyncPlan = Tuple[
+    Set[str], Dict[str, List[Any]], List[Tuple[os.DirEntry, List[int], Optional[str]]]
+]
+PresetSyncResult = Tuple[str, str, List[int]]
+
+
+def _plan_preset_sync(
+    source_dir: Path, target_dir: Path, manifest_path: Path
+) -> PresetSyncPlan:
+    """
+    找出需要同步的预设动作文件（在工作线程中调用），返回 (源文件名集合, 同步清单, 待处理条目)。
+    不按目录 mtime 整体跳过：原地改写文件内容不会改变目录的 mtime，必须逐个比对文件元数据。
+    """
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    # 遍历源目录中的所有 .py 文件
+    # 使用 scandir 直接按文件名过滤，跳过 __init__.py 等特殊文件，并复用目录项缓存的 stat 结果
+    with os.scandir(source_dir) as it:
+        src_entries = [
+            entry
+            for entry in it
+            if entry.name.endswith(".py")
+            and not entry.name.startswith("__")
+            and entry.is_file()
+        ]
+
+    # 与上次同步时记录的源、目标文件元数据比较，只处理发生变化或目标缺失的文件；
+    # 元数据直接取自目录项，无需逐个打开文件比较内容
+    manifest = _load_sync_manifest(manifest_path)
+    with os.scandir(target_dir) as it:
+        target_entries = {entry.name: entry for entry in it}
+    pending: List[Tuple[os.DirEntry, List[int], Optional[str]]] = []
+    for entry in src_entries:
+        src_stat = entry.stat()
+        signature = [src_stat.st_mtime_ns, src_stat.st_size]
+        recorded = manifest.get(entry.name)
+        target_entry = target_entries.get(entry.name)
+        recorded_digest: Optional[str] = None
+        if (
+            isinstance(recorded, list)
+            and len(recorded) >= 5
+            and target_entry is not None
+        ):
+            target_stat = target_entry.stat()
+            # 目标文件在上次同步后被原地修改或截断时元数据会变化，此时不沿用清单，重新比较并恢复
+            if recorded[3:5] == [target_stat.st_mtime_ns, target_stat.st_size]:
+                if recorded[:2] == signature:
+                    continue
+                recorded_digest = recorded[2]
+        pending.append((entry, signature, recorded_digest))
+    return {entry.name for entry in src_entries}, manifest, pending
+
+
+def _sync_preset_file(
+    src: os.DirEntry, target_dir: Path, recorded_digest: Optional[str] = None
+) -> PresetSyncResult:
+    """
+    同步单个预设动作文件（在工作线程中调用）。
+    返回 (状态, 源文件内容哈希, [目标文件 mtime_ns, 大小])，状态为 "new"（新复制）、
+    "updated"（内容变化后覆盖）或 "same"（无需处理）。
+    recorded_digest 为同步清单中记录的上次同步内容哈希，仅在目标文件自上次同步后未被改动时传入，
+    源文件仅被 touch 过时据此跳过复制。
+    """
+    src_path = Path(src.path)
+    digest = _get_file_hash(src_path)
+    target_file = target_dir / src.name
+    try:
+        target_stat = target_file.stat()
+    except FileNotFoundError:
+        # 如果目标文件不存在，直接复制
+        status = "new"
+    else:
+        # 先比较元数据：大小不同必然已变化，大小与修改时间都相同则视为未变化；
+        # 元数据无法判定时再比较内容（优先使用清单中记录的哈希，无需读取目标文件）
+        src_stat = src.stat()
+        target_signature = [target_stat.st_mtime_ns, target_stat.st_size]
+        if recorded_digest is not None and digest == recorded_digest:
+            return "same", digest, target_signature
+        if src_stat.st_size != target_stat.st_size:
+            status = "updated"
+        elif src_stat.st_mtime_ns == target_stat.st_mtime_ns:
+            return "same", digest, target_signature
+        elif _files_equal(src_path, target_file, src_stat.st_size):
+            return "same", digest, target_signature
+        else:
+            status = "updated"
+
+    # copy2 按字节复制（Linux 上经由 sendfile，不经过 Python 缓冲区）并保留修改时间
+    shutil.copy2(src_path, target_file)
+    target_stat = target_file.stat()
+    return status, digest, [target_stat.st_mtime_ns, target_stat.st_size]
+
+
 @register(
     PLUGIN_NAME,
     "clown145",
@@ -142,6 +480,27 @@ def _get_file_hash(path: Path) -> str:
     "https://github.com/clown145/astrbot_plugin_tg_button",
 )
 class DynamicButtonFrameworkPlugin(Star):
+    # 处理器使用的回调前缀；与实例无关，定义为类常量
+    CALLBACK_PREFIX_COMMAND: ClassVar[str] = "tgbtn:cmd:"
+    CALLBACK_PREFIX_MENU: ClassVar[str] = "tgbtn:menu:"
+    CALLBACK_PREFIX_BACK: ClassVar[str] = "tgbtn:back:"
+    CALLBACK_PREFIX_ACTION: ClassVar[str] = "tgbtn:act:"
+    CALLBACK_PREFIX_WORKFLOW: ClassVar[str] = "tgbtn:wf:"
+    CALLBACK_PREFIX_REDIRECT: ClassVar[str] = "tgbtn:redirect:"
+    # 所有回调前缀共享的根前缀，形如 "tgbtn:<类型>:<载荷>"
+    CALLBACK_PREFIX_ROOT: ClassVar[str] = "tgbtn:"
+    # 回调数据中紧跟按钮 ID 的前缀，以及对应的类型代码（wf/act/cmd/menu/back）
+    BUTTON_CALLBACK_PREFIXES: ClassVar[Tuple[str, ...]] = (
+        CALLBACK_PREFIX_WORKFLOW,
+        CALLBACK_PREFIX_ACTION,
+        CALLBACK_PREFIX_COMMAND,
+        CALLBACK_PREFIX_MENU,
+        CALLBACK_PREFIX_BACK,
+    )
+    _callback_prefix_by_code: ClassVar[Mapping[str, str]] = MappingProxyType(
+        {prefix.split(":")[1]: prefix for prefix in BUTTON_CALLBACK_PREFIXES}
+    )
+
     def __init__(self, context: Context, config: AstrBotConfig):
         super().__init__(context)
         # 使用配置模块中的函数构建设置
@@ -176,30 +535,65 @@ class DynamicButtonFrameworkPlugin(Star):
             registry=self.action_registry,
             modular_registry=self.modular_action_registry,
         )
-        self.webui_server: Optional[WebUIServer] = None
+        self.webui_server: Optional["WebUIServer"] = None
 
         # Telegram 特定状态
         self._callback_handler: Optional[CallbackQueryHandler] = None
         self._telegram_application: Optional[Any] = None
-
-        # 处理器使用的回调前缀
-        self.CALLBACK_PREFIX_COMMAND = "tgbtn:cmd:"
-        self.CALLBACK_PREFIX_MENU = "tgbtn:menu:"
-        self.CALLBACK_PREFIX_BACK = "tgbtn:back:"
-        self.CALLBACK_PREFIX_ACTION = "tgbtn:act:"
-        self.CALLBACK_PREFIX_WORKFLOW = "tgbtn:wf:"
-        self.CALLBACK_PREFIX_REDIRECT = "tgbtn:redirect:"
+        # 缓存 platform.get_client() 返回的 ExtBot，复用其内部的连接池
+        self._telegram_client: Optional[ExtBot] = None
+        self._telegram_client_platform: Optional[Any] = None
+        self._telegram_platform: Optional[Any] = None
+        self._telegram_platform_expires_at = 0.0
+        self._telegram_event_context: Optional[_TelegramEventContext] = None
+        # 会话键 -> (回调队列, 工作任务)：同一会话内按顺序处理，不同会话之间并发
+        self._callback_workers: Dict[str, Tuple[asyncio.Queue, asyncio.Task]] = {}
+
+        # 菜单键盘缓存：键为 (菜单 ID, 覆盖参数)，快照修订号变化时整体清空
+        # Telegram 组件在导入时即已确定，提前计算可用性，避免在逐按钮渲染时重复判断
+        self._tg_available = bool(InlineKeyboardMarkup and InlineKeyboardButton)
+        self._webapp_available = bool(WebAppInfo)
+        self._markup_cache: Dict[
+            Tuple[str, Optional[str]],
+            Tuple[Optional[InlineKeyboardMarkup], Optional[str]],
+        ] = {}
+        self._markup_cache_revision: Optional[int] = None
+        # (回调前缀, 标识) -> 回调数据字符串，与键盘缓存一同按修订号失效
+        self._callback_data_cache: Dict[Tuple[str, str], str] = {}
+
+        # 启动与热重载两个入口都会触发初始化，用锁与标记避免重复执行
+        self._init_lock = asyncio.Lock()
+        self._actions_loaded = False
+        self._initialized = False
+        # 按钮类型 -> 键盘按钮构造函数，替代渲染时逐个比较类型的 if 链
+        self._button_factories: Dict[
+            str, Callable[..., Optional[InlineKeyboardButton]]
+        ] = {
+            "raw": self._make_raw_button,
+            "command": self._make_command_button,
+            "url": self._make_url_button,
+            "submenu": self._make_submenu_button,
+            "action": self._make_action_button,
+            "workflow": self._make_workflow_button,
+            "inline_query": self._make_inline_query_button,
+            "switch_inline_query": self._make_switch_inline_query_button,
+            "web_app": self._make_web_app_button,
+            "back": self._make_back_button,
+        }
 
         logger.info(
             f"Dynamic button plugin loaded; menu command '/{self.menu_command}', WebUI={'enabled' if self.webui_enabled else 'disabled'}."
         )
 
-        # 处理热重载
+        # 处理热重载：重载时插件在运行中的事件循环里实例化，on_astrbot_loaded 不会再次触发，
+        # 需要自行调度初始化；不在事件循环中实例化时由 on_astrbot_loaded 钩子完成初始化。
+        # 不再回退到 asyncio.get_event_loop()：它可能新建一个永远不会运行的循环，任务被静默丢弃
         try:
             loop = asyncio.get_running_loop()
         except RuntimeError:
-            loop = asyncio.get_event_loop()
-        loop.create_task(self._post_init_after_reload())
+            loop = None
+        if loop is not None:
+            handlers.spawn_background_task(self._post_init_after_reload(), loop)
 
     # --- 插件生命周期管理 ---
 
@@ -207,6 +601,8 @@ class DynamicButtonFrameworkPlugin(Star):
         """
         将插件内置的 local_actions 同步到用户数据目录下的 modular_actions，并加载所有模块化动作。
         此函数确保每次重载插件时，都会检查并更新预设动作文件。
+        源文件与目标文件的 (mtime, 大小) 都与同步清单一致时直接跳过，无需比较内容；
+        目标文件被改动或截断时会重新比较并恢复；源文件元数据变化但内容哈希与清单一致（仅被 touch）时不重新复制。
         """
         source_dir = Path(__file__).parent / "local_actions"
         target_dir = self.modular_actions_dir
@@ -216,36 +612,56 @@ class DynamicButtonFrameworkPlugin(Star):
             await self.modular_action_registry.scan_and_load_actions()
             return
 
-        target_dir.mkdir(parents=True, exist_ok=True)
-        synced_count = 0
-        updated_count = 0
-
-        # 同步逻辑：遍历源目录中的所有 .py 文件
-        for src_file in source_dir.glob("*.py"):
-            if src_file.name.startswith("__"):
-                continue  # 跳过 __init__.py 等特殊文件
+        # 目录扫描、stat 与清单读取全部在工作线程中完成，不阻塞事件循环
+        manifest_path = target_dir / PRESET_SYNC_MANIFEST
+        source_names, manifest, pending = await asyncio.to_thread(
+            _plan_preset_sync, source_dir, target_dir, manifest_path
+        )
 
-            target_file = target_dir / src_file.name
-            should_copy = False
+        # 各文件相互独立，在线程池中并发比较与复制，避免阻塞事件循环
+        semaphore = asyncio.Semaphore(PRESET_SYNC_CONCURRENCY)
 
-            if not target_file.exists():
-                # 如果目标文件不存在，直接复制
-                should_copy = True
-                synced_count += 1
-            else:
-                # 如果目标文件已存在，比较文件内容的哈希值
-                src_hash = _get_file_hash(src_file)
-                target_hash = _get_file_hash(target_file)
-                if src_hash != target_hash:
-                    should_copy = True
-                    updated_count += 1
-
-            if should_copy:
+        async def _sync_guarded(
+            entry: os.DirEntry, recorded_digest: Optional[str]
+        ) -> PresetSyncResult:
+            async with semaphore:
                 try:
-                    content = src_file.read_text(encoding="utf-8")
-                    target_file.write_text(content, encoding="utf-8")
+                    return await asyncio.to_thread(
+                        _sync_preset_file, entry, target_dir, recorded_digest
+                    )
                 except Exception as e:
-                    self.logger.error(f"同步预设动作文件 {src_file.name} 失败: {e}")
+                    self.logger.error(f"同步预设动作文件 {entry.name} 失败: {e}")
+                    return "failed", "", []
+
+        results = await asyncio.gather(
+            *(_sync_guarded(e, digest) for e, _, digest in pending)
+        )
+        statuses = [status for status, _, _ in results]
+        synced_count = statuses.count("new")
+        updated_count = statuses.count("updated")
+
+        manifest_changed = bool(pending) or any(
+            name not in source_names for name in manifest
+        )
+        if manifest_changed:
+            new_manifest = {
+                name: signature
+                for name, signature in manifest.items()
+                if name in source_names
+            }
+            for (entry, signature, _), (status, digest, target_signature) in zip(
+                pending, results
+            ):
+                if status == "failed":
+                    new_manifest.pop(entry.name, None)
+                else:
+                    new_manifest[entry.name] = [*signature, digest, *target_signature]
+            try:
+                await asyncio.to_thread(
+                    _save_sync_manifest, manifest_path, new_manifest
+                )
+            except OSError as e:
+                self.logger.warning(f"写入预设动作同步清单失败: {e}")
 
         if synced_count > 0:
             self.logger.info(f"成功同步 {synced_count} 个新的预设动作文件。")
@@ -259,17 +675,35 @@ class DynamicButtonFrameworkPlugin(Star):
         """
         统一的初始化函数，用于加载、迁移和注册插件的核心功能。
         避免在 _on_astrbot_loaded 和 _post_init_after_reload 中出现重复代码。
+        两个入口可能先后触发，完成初始化后的再次调用直接返回。
         """
-        await self._migrate_and_load_actions()
-        await self._ensure_webui()
-        await self._register_telegram_callbacks()
+        # 双重检查：已完成时无需获取锁
+        if self._initialized:
+            return
+        async with self._init_lock:
+            if self._initialized:
+                return
+            if not self._actions_loaded:
+                await self._migrate_and_load_actions()
+                self._actions_loaded = True
+            await self._ensure_webui()
+            await self._register_telegram_callbacks()
+            # 冷启动时 Telegram 平台可能尚未就绪，此时保留标记为未完成，由后续入口补注册回调
+            self._initialized = bool(
+                self.webui_exclusive
+                or not Application
+                or not CallbackQueryHandler
+                or self._callback_handler
+            )
 
     @filter.on_astrbot_loaded()
     async def _on_astrbot_loaded(self):
         await self._initialize_plugin_features()
 
     async def _post_init_after_reload(self):
-        await asyncio.sleep(0.05)
+        # 让出一次事件循环，等 __init__ 返回、框架完成插件注册后再初始化；
+        # 无需固定等待 50ms，与 on_astrbot_loaded 的重复触发由 _initialize_plugin_features 的锁去重
+        await asyncio.sleep(0)
         await self._initialize_plugin_features()
 
     async def terminate(self):
@@ -282,20 +716,35 @@ class DynamicButtonFrameworkPlugin(Star):
                 logger.error(f"移除 Telegram 回调处理器时出错: {exc}", exc_info=True)
             self._callback_handler = None
             self._telegram_application = None
+        self._telegram_client = None
+        self._telegram_client_platform = None
+        self._telegram_platform = None
+        self._telegram_platform_expires_at = 0.0
+        self._telegram_event_context = None
+        workers, self._callback_workers = self._callback_workers, {}
+        for _queue, task in workers.values():
+            task.cancel()
+        self._actions_loaded = False
+        self._initialized = False
+        # WebUI 服务与动作执行器相互独立，并发关闭以缩短停用耗时
+        closers = [self.action_executor.close()]
         if self.webui_server:
-            await self.webui_server.stop()
+            closers.append(self.webui_server.stop())
             self.webui_server = None
-        await self.action_executor.close()
+        for result in await asyncio.gather(*closers, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.error(f"停用插件时关闭组件出错: {result}", exc_info=result)
 
         # --- 新增的缓存清理逻辑 ---
-        try:
+        # 在线程中删除，避免缓存文件较多时阻塞事件循环；目录不存在时无需清理，也不记录日志
+        if os.path.exists(self.temp_dir):
+            await asyncio.to_thread(shutil.rmtree, self.temp_dir, True)
             if os.path.exists(self.temp_dir):
-                shutil.rmtree(self.temp_dir)
+                self.logger.error(
+                    f"清理临时文件目录 {self.temp_dir} 失败，目录仍然存在。"
+                )
+            else:
                 self.logger.info(f"插件停用/重载，已清空临时文件目录: {self.temp_dir}")
-        except Exception as exc:
-            self.logger.error(
-                f"清理临时文件目录 {self.temp_dir} 失败: {exc}", exc_info=True
-            )
         # --- 清理逻辑结束 ---
 
     # --- 内部设置 ---
@@ -303,6 +752,8 @@ class DynamicButtonFrameworkPlugin(Star):
     async def _ensure_webui(self):
         if not self.webui_enabled or self.webui_server:
             return
+        from .webui import WebUIServer
+
         server = WebUIServer(
             plugin=self,
             logger=logger,
@@ -331,7 +782,7 @@ class DynamicButtonFrameworkPlugin(Star):
         if not Application or not CallbackQueryHandler or self._callback_handler:
             return
 
-        platform = self.context.get_platform("telegram")
+        platform = self._get_telegram_platform()
         if not platform:
             logger.warning("未检测到 Telegram 平台，跳过回调注册。")
             return
@@ -351,8 +802,37 @@ class DynamicButtonFrameworkPlugin(Star):
     # --- 事件处理器（包装器） ---
 
     async def _handle_callback_query(self, update, _context):
-        """将回调查询处理委托给 handlers 模块的包装器。"""
-        await handlers.handle_callback_query(self, update, _context)
+        """
+        将回调查询投递到其所属会话的队列，由该会话的工作任务交给 handlers 模块处理。
+        同一会话（及话题）内保持到达顺序，不同会话之间互不阻塞。
+        """
+        key = _callback_chat_key(update)
+        worker = self._callback_workers.get(key)
+        if worker is None:
+            queue: asyncio.Queue = asyncio.Queue()
+            queue.put_nowait((update, _context))
+            task = handlers.spawn_background_task(self._run_callback_worker(key, queue))
+            self._callback_workers[key] = (queue, task)
+        else:
+            worker[0].put_nowait((update, _context))
+
+    async def _run_callback_worker(self, key: str, queue: asyncio.Queue):
+        """逐个处理某会话的回调；空闲超时后将自身从工作表中移除并退出。"""
+        while True:
+            try:
+                update, context = await asyncio.wait_for(
+                    queue.get(), CALLBACK_WORKER_IDLE_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                # 超时与移除之间没有挂起点，不会有新回调在此期间入队
+                worker = self._callback_workers.get(key)
+                if worker is not None and worker[0] is queue:
+                    del self._callback_workers[key]
+                return
+            try:
+                await handlers.handle_callback_query(self, update, context)
+            except Exception as exc:
+                logger.error(f"处理回调查询时出错: {exc}", exc_info=True)
 
     @filter.command(MENU_COMMAND)
     async def send_menu(self, event: AstrMessageEvent):
@@ -364,20 +844,24 @@ class DynamicButtonFrameworkPlugin(Star):
     # 这些方法保留在主类中，因为外部的处理器和命令
     # 会通过 'plugin' 实例来使用它们。
 
-    async def _dispatch_command(self, query, command_text: str):
-        platform = self.context.get_platform("telegram")
-        if (
-            not platform
-            or not (client := self._get_telegram_client())
-            or not (message := query.message)
-        ):
-            return
-
+    def _build_fake_event(
+        self,
+        platform: Any,
+        client: Any,
+        *,
+        chat_id: str,
+        is_private: bool,
+        thread_id: Any,
+        sender: MessageMember,
+        message_str: str,
+        timestamp: int,
+        **message_fields: Any,
+    ) -> TelegramPlatformEvent:
+        """
+        构造一个模拟的 Telegram 消息事件，供命令派发与等待用户输入共用。
+        message_fields 中的额外字段会直接写入 AstrBotMessage。
+        """
         fake_message = AstrBotMessage()
-        is_private = message.chat.type == "private"
-        chat_id = str(message.chat.id)
-        thread_id = getattr(message, "message_thread_id", None)
-
         if is_private:
             fake_message.type = MessageType.FRIEND_MESSAGE
             fake_message.session_id = chat_id
@@ -386,30 +870,70 @@ class DynamicButtonFrameworkPlugin(Star):
             session_id = f"{chat_id}#{thread_id}" if thread_id is not None else chat_id
             fake_message.group_id = session_id
             fake_message.session_id = session_id
-
-        fake_message.self_id = str(getattr(client, "id", ""))
-        fake_message.message_id = f"{message.message_id}_btn"
-        sender = message.from_user
-        fake_message.sender = MessageMember(
-            user_id=str(sender.id) if sender else "unknown",
-            nickname=(sender.full_name if sender else None)
-            or (sender.username if sender else "Unknown"),
-        )
-        fake_message.message_str = command_text
-        fake_message.raw_message = query
-        fake_message.timestamp = int(message.date.timestamp()) if message.date else 0
-        fake_message.message = [Plain(command_text)]
+        tg_context = self._telegram_event_context
+        if (
+            tg_context is None
+            or tg_context.platform is not platform
+            or tg_context.client is not client
+        ):
+            # 平台或客户端变化（首次使用、重载）时才重新读取元数据与机器人 ID
+            tg_context = self._telegram_event_context = _TelegramEventContext(
+                platform=platform,
+                client=client,
+                platform_meta=platform.meta(),
+                self_id=str(getattr(client, "id", "")),
+            )
+        fake_message.self_id = tg_context.self_id
+        fake_message.sender = sender
+        fake_message.message_str = message_str
+        fake_message.timestamp = timestamp
+        for field_name, value in message_fields.items():
+            setattr(fake_message, field_name, value)
 
         fake_event = TelegramPlatformEvent(
-            message_str=command_text,
+            message_str=message_str,
             message_obj=fake_message,
-            platform_meta=platform.meta(),
+            platform_meta=tg_context.platform_meta,
             session_id=fake_message.session_id,
             client=client,
         )
         fake_event.context = self.context
+        return fake_event
+
+    async def _dispatch_command(self, query, command_text: str):
+        platform = self._get_telegram_platform()
+        if (
+            not platform
+            or not (client := self._get_telegram_client())
+            or not (message := query.message)
+        ):
+            return
+        # 事件队列已满时 put_nowait 会抛出 QueueFull，提前返回以免白白构造事件
+        event_queue = self.context.get_event_queue()
+        if event_queue.full():
+            logger.warning(f"事件队列已满，丢弃按钮指令: {command_text}")
+            return
+
+        sender = message.from_user
+        fake_event = self._build_fake_event(
+            platform,
+            client,
+            chat_id=str(message.chat.id),
+            is_private=message.chat.type == "private",
+            thread_id=getattr(message, "message_thread_id", None),
+            sender=MessageMember(
+                user_id=str(sender.id) if sender else "unknown",
+                nickname=(sender.full_name if sender else None)
+                or (sender.username if sender else "Unknown"),
+            ),
+            message_str=command_text,
+            timestamp=int(message.date.timestamp()) if message.date else 0,
+            message_id=f"{message.message_id}_btn",
+            raw_message=query,
+            message=[Plain(command_text)],
+        )
         fake_event.is_at_or_wake_command = True
-        self.context.get_event_queue().put_nowait(fake_event)
+        event_queue.put_nowait(fake_event)
 
     async def wait_for_user_input(
         self,
@@ -427,8 +951,9 @@ class DynamicButtonFrameworkPlugin(Star):
         display_mode: str = "button_label",
     ) -> Dict[str, Any]:
         client = self._get_telegram_client()
-        chat_id = getattr(runtime, "chat_id", None)
-        message_id = getattr(runtime, "message_id", None)
+        runtime_fields = _runtime_fields(runtime)
+        chat_id = runtime_fields.get("chat_id")
+        message_id = runtime_fields.get("message_id")
         if not client or not chat_id or not message_id:
             return {
                 "new_text": "等待用户输入失败：缺少聊天上下文。",
@@ -457,14 +982,17 @@ class DynamicButtonFrameworkPlugin(Star):
         ) -> str:
             base_text = str(raw_text or "").strip()
             if parse_mode_value == "html" and base_text:
-                base_text = html.unescape(re.sub(r"<[^>]+>", "", base_text))
+                base_text = _strip_html(base_text)
             elif (
                 parse_mode_value in ("markdown", "md", "markdownv2", "mdv2")
                 and base_text
             ):
-                cleaned = re.sub(r"[*_`~]", "", base_text)
-                if parse_mode_value in ("markdownv2", "mdv2"):
-                    cleaned = cleaned.translate(str.maketrans("", "", '\\[]()>"'))
+                # 一次 translate 同时去除 Markdown 标记与 MarkdownV2 转义字符
+                cleaned = base_text.translate(
+                    _MDV2_STRIP
+                    if parse_mode_value in ("markdownv2", "mdv2")
+                    else _MD_STRIP
+                )
                 base_text = cleaned.strip()
             if not base_text:
                 base_text = str(raw_text or "").strip()
@@ -489,7 +1017,7 @@ class DynamicButtonFrameworkPlugin(Star):
         menu_title_mode = normalized_mode == "menu_title"
         message_text_mode = normalized_mode == "message_text"
 
-        variables: Dict[str, Any] = getattr(runtime, "variables", {}) or {}
+        variables: Dict[str, Any] = runtime_fields.get("variables") or {}
         menu_id = variables.get("menu_id")
         button_id = variables.get("button_id")
         original_button_text = variables.get("button_text")
@@ -498,32 +1026,29 @@ class DynamicButtonFrameworkPlugin(Star):
             or variables.get("menu_header")
             or variables.get("menu_text")
         )
-        callback_data = getattr(runtime, "callback_data", "") or ""
+        callback_data = runtime_fields.get("callback_data") or ""
         if not button_id and callback_data:
-            for prefix in (
-                self.CALLBACK_PREFIX_WORKFLOW,
-                self.CALLBACK_PREFIX_ACTION,
-                self.CALLBACK_PREFIX_COMMAND,
-                self.CALLBACK_PREFIX_MENU,
-                self.CALLBACK_PREFIX_BACK,
-            ):
-                if callback_data.startswith(prefix):
-                    button_id = callback_data[len(prefix) :]
-                    break
+            callback_kind, callback_button_id = self.decode_callback_data(callback_data)
+            if callback_kind is not None:
+                button_id = callback_button_id
 
         button_snapshot: Optional[ButtonsModel] = None
+        snapshot_revision: Optional[int] = None
         button_menu: Optional[MenuDefinition] = None
 
         if button_label_mode or menu_title_mode:
             try:
-                button_snapshot = await self.button_store.get_snapshot()
+                (
+                    button_snapshot,
+                    snapshot_revision,
+                ) = await self.button_store.get_snapshot_with_revision()
             except Exception as exc:
                 self.logger.error(f"获取按钮快照失败: {exc}", exc_info=True)
             else:
                 if menu_id:
                     button_menu = button_snapshot.menus.get(menu_id)
                 if not button_menu and button_id:
-                    button_menu = self._find_menu_for_button(button_snapshot, button_id)
+                    button_menu = button_snapshot.find_menu_for_button(button_id)
                     if button_menu:
                         menu_id = button_menu.id
                 if button_id and not original_button_text:
@@ -542,6 +1067,15 @@ class DynamicButtonFrameworkPlugin(Star):
             menu_title_mode = False
             message_text_mode = True
 
+        async def _refresh_snapshot() -> ButtonsModel:
+            # 等待期间按钮配置未被修改时，直接复用开始等待前获取的快照
+            if button_snapshot is not None and snapshot_revision is not None:
+                changed, _ = await self.button_store.get_snapshot_if_changed(
+                    snapshot_revision
+                )
+                return changed or button_snapshot
+            return await self.button_store.get_snapshot()
+
         async def _set_button_label(
             snapshot: ButtonsModel,
             menu: MenuDefinition,
@@ -627,10 +1161,10 @@ class DynamicButtonFrameworkPlugin(Star):
                 }
 
         timeout = max(int(timeout or 0), 1)
-        cancel_set = {
+        cancel_set = frozenset(
             kw.strip().lower() for kw in (cancel_keywords or []) if kw.strip()
-        }
-        platform = self.context.get_platform("telegram")
+        )
+        platform = self._get_telegram_platform()
         if not platform:
             return {
                 "new_text": "等待用户输入失败：未找到 Telegram 平台。",
@@ -640,39 +1174,23 @@ class DynamicButtonFrameworkPlugin(Star):
                 "user_input_is_cancelled": False,
             }
 
-        fake_message = AstrBotMessage()
-        fake_message.self_id = str(client.id)
-        if getattr(runtime, "chat_type", None) == "private":
-            fake_message.type = MessageType.FRIEND_MESSAGE
-            fake_message.session_id = chat_id
-        else:
-            fake_message.type = MessageType.GROUP_MESSAGE
-            session_id = (
-                f"{chat_id}#{getattr(runtime, 'thread_id', None)}"
-                if getattr(runtime, "thread_id", None) is not None
-                else chat_id
-            )
-            fake_message.group_id = session_id
-            fake_message.session_id = session_id
-        fake_message.sender = MessageMember(
-            user_id=getattr(runtime, "user_id", "") or "",
-            nickname=(
-                getattr(runtime, "full_name", None)
-                or getattr(runtime, "username", None)
-                or ""
+        fake_event = self._build_fake_event(
+            platform,
+            client,
+            chat_id=chat_id,
+            is_private=runtime_fields.get("chat_type") == "private",
+            thread_id=runtime_fields.get("thread_id"),
+            sender=MessageMember(
+                user_id=runtime_fields.get("user_id") or "",
+                nickname=(
+                    runtime_fields.get("full_name")
+                    or runtime_fields.get("username")
+                    or ""
+                ),
             ),
+            message_str="/__wait_for_input__",
+            timestamp=int(time.time()),
         )
-        fake_message.message_str = "/__wait_for_input__"
-        fake_message.timestamp = int(time.time())
-
-        fake_event = TelegramPlatformEvent(
-            message_str=fake_message.message_str,
-            message_obj=fake_message,
-            platform_meta=platform.meta(),
-            session_id=fake_message.session_id,
-            client=client,
-        )
-        fake_event.context = self.context
 
         captured: Dict[str, Any] = {
             "text": "",
@@ -697,9 +1215,9 @@ class DynamicButtonFrameworkPlugin(Star):
             nonlocal outcome
             text = event.message_str or ""
             stripped = text.strip()
-            lowered = stripped.lower()
 
-            if cancel_set and lowered in cancel_set:
+            # 未配置取消关键字时不做 lower()，避免每条消息多分配一个字符串
+            if cancel_set and stripped.lower() in cancel_set:
                 captured["text"] = text
                 msg_obj = getattr(event, "message_obj", None)
                 captured["message_id"] = getattr(msg_obj, "message_id", None)
@@ -778,7 +1296,7 @@ class DynamicButtonFrameworkPlugin(Star):
 
             if button_id and menu_id and final_label:
                 try:
-                    latest_snapshot = await self.button_store.get_snapshot()
+                    latest_snapshot = await _refresh_snapshot()
                 except Exception as exc:
                     self.logger.error(f"刷新按钮快照失败: {exc}", exc_info=True)
                     latest_snapshot = None
@@ -788,9 +1306,7 @@ class DynamicButtonFrameworkPlugin(Star):
                         latest_snapshot.menus.get(menu_id) if latest_snapshot else None
                     )
                     if latest_snapshot and not latest_menu and button_id:
-                        latest_menu = self._find_menu_for_button(
-                            latest_snapshot, button_id
-                        )
+                        latest_menu = latest_snapshot.find_menu_for_button(button_id)
                 if latest_snapshot and latest_menu:
                     await _set_button_label(latest_snapshot, latest_menu, final_label)
                 button_overrides.append(
@@ -810,14 +1326,14 @@ class DynamicButtonFrameworkPlugin(Star):
             latest_snapshot: Optional[ButtonsModel] = None
             latest_menu: Optional[MenuDefinition] = None
             try:
-                latest_snapshot = await self.button_store.get_snapshot()
+                latest_snapshot = await _refresh_snapshot()
             except Exception as exc:
                 self.logger.error(f"刷新按钮快照失败: {exc}", exc_info=True)
             else:
                 if menu_id:
                     latest_menu = latest_snapshot.menus.get(menu_id)
                 if not latest_menu and button_id:
-                    latest_menu = self._find_menu_for_button(latest_snapshot, button_id)
+                    latest_menu = latest_snapshot.find_menu_for_button(button_id)
             if latest_snapshot and latest_menu and final_text:
                 await _set_menu_header(latest_snapshot, latest_menu, final_text)
             final_text = final_text or original_menu_header or prompt_text
@@ -843,7 +1359,7 @@ class DynamicButtonFrameworkPlugin(Star):
 
         result: Dict[str, Any] = {
             "user_input": user_input_text,
-            "user_input_status": outcome if outcome != "timeout" else "timeout",
+            "user_input_status": outcome,
             "user_input_is_timeout": timed_out,
             "user_input_is_cancelled": cancelled,
         }
@@ -853,13 +1369,12 @@ class DynamicButtonFrameworkPlugin(Star):
         if captured.get("timestamp") is not None:
             result["user_input_timestamp"] = captured["timestamp"]
 
-        if menu_title_mode and final_text:
-            result["new_text"] = final_text
-            result["parse_mode"] = parse_mode or "html"
-            result["should_edit_message"] = True
-        elif final_text and not button_label_mode:
+        # 菜单标题模式与普通消息模式互斥，共用同一组写入
+        if final_text and (menu_title_mode or not button_label_mode):
             result["new_text"] = final_text
             result["parse_mode"] = parse_mode or "html"
+            if menu_title_mode:
+                result["should_edit_message"] = True
 
         if button_overrides:
             result["button_overrides"] = button_overrides
@@ -914,15 +1429,58 @@ class DynamicButtonFrameworkPlugin(Star):
             display_mode=display_mode,
         )
 
-    def _get_telegram_client(self) -> Optional[ExtBot]:
+    def _get_telegram_platform(self) -> Optional[Any]:
+        """
+        短时间内复用 context.get_platform("telegram") 的结果。
+        一次按钮点击会在多处查找平台（分发指令、获取客户端等），在 TTL 内只查询一次注册表；
+        平台被重载后最多延迟 TELEGRAM_PLATFORM_CACHE_TTL 秒生效。查找失败不缓存。
+        """
+        now = time.monotonic()
+        if now < self._telegram_platform_expires_at:
+            return self._telegram_platform
         platform = self.context.get_platform("telegram")
+        self._telegram_platform = platform
+        self._telegram_platform_expires_at = (
+            now + TELEGRAM_PLATFORM_CACHE_TTL if platform else 0.0
+        )
+        return platform
+
+    def _get_telegram_client(self) -> Optional[ExtBot]:
+        """
+        获取 Telegram 客户端。
+        客户端按 platform 实例缓存：同一个 ExtBot 会在插件生命周期内复用，
+        从而共享其底层 HTTPXRequest 的 keep-alive 连接池，避免每次发送都重新握手。
+        platform 被重载（实例变化）时会自动重新获取。
+        """
+        # 获取失败不做缓存：平台启动期间失败后，下一次调用即可拿到就绪的客户端
+        platform = self._get_telegram_platform()
         if not platform:
+            self._telegram_client = None
+            self._telegram_client_platform = None
             return None
+        if (
+            self._telegram_client is not None
+            and self._telegram_client_platform is platform
+        ):
+            return self._telegram_client
         try:
-            return platform.get_client()
+            client = platform.get_client()
         except Exception as exc:
             logger.error(f"获取 Telegram 客户端失败: {exc}", exc_info=True)
-            return None
+            client = None
+            # 平台可能正在重连，下次查询时重新走注册表
+            self._telegram_platform_expires_at = 0.0
+        self._telegram_client = client
+        self._telegram_client_platform = platform if client else None
+        return client
+
+    @property
+    def telegram_client(self) -> Optional[ExtBot]:
+        """
+        当前 Telegram 客户端的只读访问入口，供模块化动作在热路径上使用。
+        不使用 cached_property：platform 可能被重载，需要经由 _get_telegram_client 校验缓存。
+        """
+        return self._get_telegram_client()
 
     def _build_menu_markup(
         self,
@@ -930,78 +1488,133 @@ class DynamicButtonFrameworkPlugin(Star):
         snapshot: ButtonsModel,
         overrides: Optional[Dict[str, Dict[str, Any]]] = None,
     ) -> Tuple[Optional[InlineKeyboardMarkup], Optional[str]]:
-        if not InlineKeyboardMarkup or not InlineKeyboardButton:
+        """
+        构建菜单键盘，结果按 (菜单 ID, 快照修订号, 覆盖参数) 缓存。
+        InlineKeyboardMarkup 是不可变对象，可在多次渲染间安全复用。
+        只有 get_shared_snapshot 返回的只读快照带有修订号，可修改的副本不参与缓存。
+        """
+        revision = snapshot.revision
+        cached_revision = self._markup_cache_revision
+        if revision is None or (
+            cached_revision is not None and revision < cached_revision
+        ):
+            # 可修改的副本无法判断是否被改动；仍被持有的旧快照不应清空当前修订号的缓存
+            return self._render_menu_markup(menu_id, snapshot, overrides)
+        if revision != cached_revision:
+            self._markup_cache.clear()
+            self._callback_data_cache.clear()
+            self._markup_cache_revision = revision
+        overrides_key = (
+            json.dumps(overrides, sort_keys=True, ensure_ascii=False, default=str)
+            if overrides
+            else None
+        )
+        cache_key = (menu_id, overrides_key)
+        cached = self._markup_cache.get(cache_key)
+        if cached is None:
+            cached = self._render_menu_markup(menu_id, snapshot, overrides)
+            if len(self._markup_cache) >= MARKUP_CACHE_MAX_ENTRIES:
+                self._markup_cache.clear()
+            self._markup_cache[cache_key] = cached
+        return cached
+
+    def _render_menu_markup(
+        self,
+        menu_id: str,
+        snapshot: ButtonsModel,
+        overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> Tuple[Optional[InlineKeyboardMarkup], Optional[str]]:
+        if not self._tg_available:
             return None, None
         menu = snapshot.menus.get(menu_id)
         if not menu:
             return None, None
-        button_entities: List[ButtonDefinition] = [
-            snapshot.buttons.get(btn_id)
-            for btn_id in menu.items
-            if snapshot.buttons.get(btn_id)
-        ]
-        overrides = overrides or {}
-        rows: List[List[InlineKeyboardButton]] = []
-        if self._should_stack(button_entities, menu, overrides):
-            for btn in button_entities:
-                override = overrides.get(btn.id)
-                widget = self._create_inline_button(btn, snapshot, override)
-                if widget:
-                    rows.append([widget])
-        else:
-            row_map: Dict[int, List[Tuple[int, InlineKeyboardButton]]] = {}
-
-            def add_widget(
-                row_index: int, col_index: int, widget: InlineKeyboardButton
-            ) -> None:
-                row_map.setdefault(row_index, []).append((col_index, widget))
-
-            for btn in button_entities:
-                override = overrides.get(btn.id)
-                widget = self._create_inline_button(btn, snapshot, override)
-                if not widget:
-                    continue
-                layout_override = override.get("layout") if override else None
-                layout_row = (
-                    layout_override.get("row")
-                    if layout_override and "row" in layout_override
-                    else btn.layout.row
-                )
-                layout_col = (
-                    layout_override.get("col")
-                    if layout_override and "col" in layout_override
-                    else btn.layout.col
-                )
-                add_widget(layout_row, layout_col, widget)
+        # 绝大多数渲染不带覆盖参数，此时跳过逐按钮的覆盖查找
+        has_overrides = bool(overrides)
+        overrides = overrides or _EMPTY_OVERRIDES
+        header = menu.header or self.menu_header
+        if not has_overrides or not any(o.get("layout") for o in overrides.values()):
+            # 覆盖参数不改变布局时，直接沿用快照上预先排好的按钮行，无需逐次分行排序
+            create = self._create_inline_button
+            get_override = overrides.get
+            rows = []
+            for layout_row in snapshot.menu_layout(menu):
+                row = []
+                for btn in layout_row:
+                    widget = create(
+                        btn, snapshot, get_override(btn.id) if has_overrides else None
+                    )
+                    if widget:
+                        row.append(widget)
+                if row:
+                    rows.append(row)
+            return (InlineKeyboardMarkup(rows) if rows else None), header
+        button_entities = snapshot.resolved_buttons(menu)
+        # 单次遍历同时完成：构建按钮、判断是否逐行堆叠、收集行列位置
+        get_override = overrides.get
+        placed: List[Tuple[Any, Any, InlineKeyboardButton]] = []
+        max_row = -1
+        rows_are_indices = True
+        # 所有按钮都是默认布局 (0, 0, 1, 1) 且覆盖参数未指定布局时，每个按钮单独成行
+        stack = bool(button_entities)
+        for btn in button_entities:
+            override = get_override(btn.id) if has_overrides else None
+            layout = btn.layout
+            layout_override = override.get("layout") if override else None
+            if stack and (
+                layout_override
+                or layout.row != 0
+                or layout.col != 0
+                or layout.rowspan != 1
+                or layout.colspan != 1
+            ):
+                stack = False
+            widget = self._create_inline_button(btn, snapshot, override)
+            if not widget:
+                continue
+            if layout_override:
+                layout_row = layout_override.get("row", layout.row)
+                layout_col = layout_override.get("col", layout.col)
+            else:
+                layout_row = layout.row
+                layout_col = layout.col
+            placed.append((layout_row, layout_col, widget))
+            if type(layout_row) is int and 0 <= layout_row <= MAX_BUCKET_ROW:
+                if layout_row > max_row:
+                    max_row = layout_row
+            else:
+                rows_are_indices = False
 
-            for row_idx in sorted(row_map.keys()):
-                ordered = [
-                    widget
-                    for _, widget in sorted(row_map[row_idx], key=lambda item: item[0])
+        rows: List[List[InlineKeyboardButton]]
+        if stack:
+            rows = [[widget] for _, _, widget in placed]
+        else:
+            # 插入时即按 (列号, 序号) 有序放入行内：序号保证列号相同时维持原顺序，
+            # 且永远不会比较到按钮对象本身，省去事后逐行排序
+            if rows_are_indices:
+                # 行号是较小的非负整数（常见情况）：直接按行号放入列表桶，无需哈希与排序行号
+                buckets: List[List[Tuple[Any, int, InlineKeyboardButton]]] = [
+                    [] for _ in range(max_row + 1)
                 ]
-                if ordered:
-                    rows.append(ordered)
+                for seq, (layout_row, layout_col, widget) in enumerate(placed):
+                    insort(buckets[layout_row], (layout_col, seq, widget))
+                ordered_rows = [bucket for bucket in buckets if bucket]
+            else:
+                # 覆盖参数给出了负数或非整数行号时，回退为按行号有序插入
+                row_map: Dict[Any, List[Tuple[Any, int, InlineKeyboardButton]]] = {}
+                row_order: List[Any] = []
+                for seq, (layout_row, layout_col, widget) in enumerate(placed):
+                    bucket = row_map.get(layout_row)
+                    if bucket is None:
+                        bucket = row_map[layout_row] = []
+                        insort(row_order, layout_row)
+                    insort(bucket, (layout_col, seq, widget))
+                ordered_rows = [row_map[row_idx] for row_idx in row_order]
+
+            rows = [[widget for _, _, widget in bucket] for bucket in ordered_rows]
         if not rows:
-            return None, menu.header or self.menu_header
-        return InlineKeyboardMarkup(rows), menu.header or self.menu_header
-
-    def _should_stack(
-        self,
-        buttons: List[ButtonDefinition],
-        menu: MenuDefinition,
-        overrides: Dict[str, Dict[str, Any]],
-    ) -> bool:
-        if not buttons:
-            return False
-        for btn in buttons:
-            if btn.layout.row != 0 or btn.layout.col != 0:
-                return False
-            if btn.layout.rowspan != 1 or btn.layout.colspan != 1:
-                return False
-            override = overrides.get(btn.id)
-            if override and override.get("layout"):
-                return False
-        return True
+            return None, header
+        return InlineKeyboardMarkup(rows), header
 
     def _resolve_web_app_url(self, web_app: WebAppDefinition) -> Optional[str]:
         if web_app.kind == "external":
@@ -1019,159 +1632,231 @@ class DynamicButtonFrameworkPlugin(Star):
         for entry in overrides or []:
             if not isinstance(entry, dict):
                 continue
-            target = entry.get("target", "self")
+            target_ids = _compile_override_target(entry.get("target", "self"))(
+                snapshot, menu, current_button_id
+            )
+            # 先解析目标，未命中任何按钮的条目无需构建覆盖字典
+            if not target_ids:
+                continue
             base = {k: v for k, v in entry.items() if k != "target"}
             if not base:
                 continue
-            target_ids = self._resolve_override_targets(
-                snapshot, menu, target, current_button_id
-            )
+            shared = len(target_ids) == 1
             for button_id in target_ids:
-                bucket = resolved.setdefault(button_id, {})
-                bucket.update(base)
+                bucket = resolved.get(button_id)
+                if bucket is None:
+                    # base 是本条目新建的字典，只有一个目标时可直接作为结果，无需复制
+                    resolved[button_id] = base if shared else dict(base)
+                else:
+                    bucket.update(base)
         return resolved
 
-    def _resolve_override_targets(
+    def decode_callback_data(self, data: str) -> Tuple[Optional[str], str]:
+        """
+        解析 "tgbtn:<类型>:<载荷>" 形式的按钮回调，返回 (对应的 CALLBACK_PREFIX_* 常量, 载荷)。
+        只检查一次公共根前缀并按第一个 ":" 拆分；不是按钮回调时返回 (None, data)。
+        """
+        payload = data.removeprefix(self.CALLBACK_PREFIX_ROOT)
+        if payload != data:
+            type_code, sep, ident = payload.partition(":")
+            if sep:
+                prefix = self._callback_prefix_by_code.get(type_code)
+                if prefix is not None:
+                    return prefix, ident
+        return None, data
+
+    def _callback_data(self, prefix: str, ident: str) -> str:
+        """拼接回调数据并复用相同 (前缀, 标识) 的结果，避免每次渲染都分配新字符串。"""
+        key = (prefix, ident)
+        data = self._callback_data_cache.get(key)
+        if data is None:
+            if len(self._callback_data_cache) >= CALLBACK_DATA_CACHE_MAX_ENTRIES:
+                self._callback_data_cache.clear()
+            data = self._callback_data_cache[key] = f"{prefix}{ident}"
+        return data
+
+    def _create_inline_button(
         self,
+        button: ButtonDefinition,
         snapshot: ButtonsModel,
-        menu: MenuDefinition,
-        target: str,
-        current_button_id: str,
-    ) -> List[str]:
+        override: Optional[Dict[str, Any]] = None,
+    ) -> Optional[InlineKeyboardButton]:
+        """调用方 (_render_menu_markup) 已确认 Telegram 组件可用。"""
+        if not override:
+            # 无覆盖参数的常见情况：跳过只由覆盖参数触发的分支
+            override = _EMPTY_OVERRIDES
+            text = button.text or "未命名"
+            raw_type = button.type or "command"
+        else:
+            text = override.get("text") or button.text or "未命名"
+            if override.get("switch_inline_query") or override.get(
+                "switch_inline_query_current_chat"
+            ):
+                return InlineKeyboardButton(
+                    text,
+                    switch_inline_query=override.get("switch_inline_query"),
+                    switch_inline_query_current_chat=override.get(
+                        "switch_inline_query_current_chat"
+                    ),
+                )
+            raw_callback = override.get("raw_callback_data")
+            if raw_callback:
+                return InlineKeyboardButton(text, callback_data=raw_callback)
+            raw_type = override.get("type") or button.type or "command"
+        # 按类型查表分派；类型名通常已是小写，查不到时才做一次 lower()
+        factory = self._button_factories.get(raw_type)
+        if factory is None:
+            factory = self._button_factories.get(raw_type.lower())
+            if factory is None:
+                return None
+        return factory(button, snapshot, override, text)
+
+    def _make_raw_button(
+        self,
+        button: ButtonDefinition,
+        _snapshot: ButtonsModel,
+        override: Mapping[str, Any],
+        text: str,
+    ) -> Optional[InlineKeyboardButton]:
+        callback_data = override.get("callback_data") or button.payload.get(
+            "callback_data"
+        )
+        if not callback_data:
+            return None
+        return InlineKeyboardButton(text, callback_data=callback_data)
+
+    def _make_command_button(
+        self,
+        button: ButtonDefinition,
+        _snapshot: ButtonsModel,
+        _override: Mapping[str, Any],
+        text: str,
+    ) -> Optional[InlineKeyboardButton]:
+        if not button.payload.get("command"):
+            return None
+        return InlineKeyboardButton(
+            text,
+            callback_data=self._callback_data(self.CALLBACK_PREFIX_COMMAND, button.id),
+        )
+
+    def _make_url_button(
+        self,
+        button: ButtonDefinition,
+        _snapshot: ButtonsModel,
+        override: Mapping[str, Any],
+        text: str,
+    ) -> Optional[InlineKeyboardButton]:
+        url = override.get("url") or button.payload.get("url")
+        if not url:
+            return None
+        return InlineKeyboardButton(text, url=url)
+
+    def _make_submenu_button(
+        self,
+        button: ButtonDefinition,
+        _snapshot: ButtonsModel,
+        override: Mapping[str, Any],
+        text: str,
+    ) -> Optional[InlineKeyboardButton]:
+        target = override.get("menu_id") or button.payload.get("menu_id")
         if not target:
-            target = "self"
-        lowered = target.lower()
-        if lowered == "self":
-            return [current_button_id] if current_button_id in snapshot.buttons else []
-        if lowered.startswith("id:"):
-            candidate = target.split(":", 1)[1]
-            return [candidate] if candidate in snapshot.buttons else []
-        if lowered.startswith("button:"):
-            candidate = target.split(":", 1)[1]
-            return [candidate] if candidate in snapshot.buttons else []
-        if lowered.startswith("index:"):
-            try:
-                idx = int(target.split(":", 1)[1])
-                if 0 <= idx < len(menu.items):
-                    candidate = menu.items[idx]
-                    return [candidate] if candidate in snapshot.buttons else []
-            except Exception:
-                return []
-        if target in snapshot.buttons:
-            return [target]
-        return []
+            return None
+        return InlineKeyboardButton(
+            text,
+            callback_data=self._callback_data(self.CALLBACK_PREFIX_MENU, target),
+        )
 
-    def _create_inline_button(
+    def _make_action_button(
+        self,
+        button: ButtonDefinition,
+        _snapshot: ButtonsModel,
+        _override: Mapping[str, Any],
+        text: str,
+    ) -> Optional[InlineKeyboardButton]:
+        if not button.payload.get("action_id"):
+            return None
+        return InlineKeyboardButton(
+            text,
+            callback_data=self._callback_data(self.CALLBACK_PREFIX_ACTION, button.id),
+        )
+
+    def _make_workflow_button(
+        self,
+        button: ButtonDefinition,
+        _snapshot: ButtonsModel,
+        _override: Mapping[str, Any],
+        text: str,
+    ) -> Optional[InlineKeyboardButton]:
+        if not button.payload.get("workflow_id"):
+            return None
+        return InlineKeyboardButton(
+            text,
+            callback_data=self._callback_data(self.CALLBACK_PREFIX_WORKFLOW, button.id),
+        )
+
+    def _make_inline_query_button(
+        self,
+        button: ButtonDefinition,
+        _snapshot: ButtonsModel,
+        override: Mapping[str, Any],
+        text: str,
+    ) -> Optional[InlineKeyboardButton]:
+        query_text = override.get("query") or button.payload.get("query", "")
+        return InlineKeyboardButton(text, switch_inline_query_current_chat=query_text)
+
+    def _make_switch_inline_query_button(
+        self,
+        button: ButtonDefinition,
+        _snapshot: ButtonsModel,
+        override: Mapping[str, Any],
+        text: str,
+    ) -> Optional[InlineKeyboardButton]:
+        query_text = override.get("query") or button.payload.get("query", "")
+        return InlineKeyboardButton(text, switch_inline_query=query_text)
+
+    def _make_web_app_button(
         self,
         button: ButtonDefinition,
         snapshot: ButtonsModel,
-        override: Optional[Dict[str, Any]] = None,
+        override: Mapping[str, Any],
+        text: str,
     ) -> Optional[InlineKeyboardButton]:
-        if not InlineKeyboardButton:
+        if not self._webapp_available:
             return None
-        override = override or {}
-        text = override.get("text") or button.text or "未命名"
-        if override.get("switch_inline_query") or override.get(
-            "switch_inline_query_current_chat"
-        ):
-            return InlineKeyboardButton(
-                text,
-                switch_inline_query=override.get("switch_inline_query"),
-                switch_inline_query_current_chat=override.get(
-                    "switch_inline_query_current_chat"
-                ),
-            )
-        raw_callback = override.get("raw_callback_data")
-        if raw_callback:
-            return InlineKeyboardButton(text, callback_data=raw_callback)
-        btn_type = (override.get("type") or button.type or "command").lower()
-        if btn_type == "raw":
-            callback_data = override.get("callback_data") or button.payload.get(
-                "callback_data"
-            )
-            if not callback_data:
-                return None
-            return InlineKeyboardButton(text, callback_data=callback_data)
-        if btn_type == "command":
-            if not button.payload.get("command"):
-                return None
-            return InlineKeyboardButton(
-                text, callback_data=f"{self.CALLBACK_PREFIX_COMMAND}{button.id}"
-            )
-        if btn_type == "url":
-            url = override.get("url") or button.payload.get("url")
-            if not url:
-                return None
-            return InlineKeyboardButton(text, url=url)
-        if btn_type == "submenu":
-            target = override.get("menu_id") or button.payload.get("menu_id")
-            if not target:
-                return None
-            return InlineKeyboardButton(
-                text, callback_data=f"{self.CALLBACK_PREFIX_MENU}{target}"
-            )
-        if btn_type == "action":
-            if not button.payload.get("action_id"):
-                return None
-            return InlineKeyboardButton(
-                text, callback_data=f"{self.CALLBACK_PREFIX_ACTION}{button.id}"
-            )
-        if btn_type == "workflow":
-            if not button.payload.get("workflow_id"):
-                return None
-            return InlineKeyboardButton(
-                text, callback_data=f"{self.CALLBACK_PREFIX_WORKFLOW}{button.id}"
-            )
-        if btn_type == "inline_query":
-            query_text = override.get("query") or button.payload.get("query", "")
-            return InlineKeyboardButton(
-                text, switch_inline_query_current_chat=query_text
-            )
-        if btn_type == "switch_inline_query":
-            query_text = override.get("query") or button.payload.get("query", "")
-            return InlineKeyboardButton(text, switch_inline_query=query_text)
-        if btn_type == "web_app":
-            web_app_id = override.get("web_app_id") or button.payload.get("web_app_id")
-            url = (
-                override.get("web_app_url")
-                or override.get("url")
-                or button.payload.get("url")
-            )
-            if web_app_id:
-                web_app = snapshot.web_apps.get(web_app_id)
-                if web_app:
-                    resolved = self._resolve_web_app_url(web_app)
-                    if resolved:
-                        url = resolved
-            if not url or not WebAppInfo:
-                return None
-            return InlineKeyboardButton(text, web_app=WebAppInfo(url=url))
-        if btn_type == "back":
-            target = (
-                override.get("menu_id")
-                or button.payload.get("menu_id")
-                or button.payload.get("target_menu")
-            )
-            if not target:
-                return None
-            return InlineKeyboardButton(
-                text, callback_data=f"{self.CALLBACK_PREFIX_BACK}{target}"
-            )
-        return None
+        web_app_id = override.get("web_app_id") or button.payload.get("web_app_id")
+        url = (
+            override.get("web_app_url")
+            or override.get("url")
+            or button.payload.get("url")
+        )
+        if web_app_id:
+            web_app = snapshot.web_apps.get(web_app_id)
+            if web_app:
+                resolved = self._resolve_web_app_url(web_app)
+                if resolved:
+                    url = resolved
+        if not url:
+            return None
+        return InlineKeyboardButton(text, web_app=WebAppInfo(url=url))
 
-    def _find_menu_for_button(
-        self, snapshot: ButtonsModel, button_id: str
-    ) -> Optional[MenuDefinition]:
-        for menu in snapshot.menus.values():
-            if button_id in menu.items:
-                return menu
-        return None
+    def _make_back_button(
+        self,
+        button: ButtonDefinition,
+        _snapshot: ButtonsModel,
+        override: Mapping[str, Any],
+        text: str,
+    ) -> Optional[InlineKeyboardButton]:
+        target = (
+            override.get("menu_id")
+            or button.payload.get("menu_id")
+            or button.payload.get("target_menu")
+        )
+        if not target:
+            return None
+        return InlineKeyboardButton(
+            text,
+            callback_data=self._callback_data(self.CALLBACK_PREFIX_BACK, target),
+        )
 
     def _split_chat_id(self, chat_id_str: str) -> Tuple[str, Optional[int]]:
-        if "#" in chat_id_str:
-            chat, _, thread = chat_id_str.partition("#")
-            try:
-                return chat, int(thread)
-            except ValueError:
-                return chat, None
-        return chat_id_str, None
+        return _split_chat_id_cached(chat_id_str)
@@ -1,8 +1,9 @@
 import importlib.util
 import inspect
+from collections.abc import Mapping
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Sequence
 
 
 @dataclass
@@ -12,8 +13,8 @@ class ModularAction:
     id: str
     name: str
     description: str
-    inputs: List[Dict[str, Any]]
-    outputs: List[Dict[str, Any]]
+    inputs: Sequence[Mapping]  # 只读，按引用共享给执行器与 WebUI
+    outputs: Sequence[Mapping]
     execute: Callable[..., Any]  # 异步的 execute 函数
     source_file: Path
 
@@ -25,6 +26,8 @@ class ModularActionRegistry:
         self._logger = logger
         self._actions_dir = actions_dir
         self._actions: Dict[str, ModularAction] = {}
+        # WebUI 动作目录的静态部分，按需构建一次，重新扫描时失效
+        self._catalog: Optional[List[Dict[str, Any]]] = None
 
     def get(self, action_id: str) -> Optional[ModularAction]:
         """根据 ID 获取已加载的模块化动作。"""
@@ -34,10 +37,30 @@ class ModularActionRegistry:
         """获取所有已加载的模块化动作。"""
         return list(self._actions.values())
 
+    def get_catalog(self) -> List[Dict[str, Any]]:
+        """
+        获取供 WebUI 展示的动作目录。
+        结果在两次扫描之间复用，调用方只能读取；需要注入动态选项的输入应先复制再修改。
+        """
+        if self._catalog is None:
+            self._catalog = [
+                {
+                    "id": action.id,
+                    "name": action.name,
+                    "description": action.description,
+                    "inputs": [dict(input_def) for input_def in action.inputs],
+                    "outputs": [dict(output_def) for output_def in action.outputs],
+                    "filename": action.source_file.name,
+                }
+                for action in self._actions.values()
+            ]
+        return self._catalog
+
     async def scan_and_load_actions(self):
         """扫描配置的目录中的 .py 文件，并将它们作为模块化动作加载。"""
         actions_dir = self._actions_dir
         self._actions.clear()
+        self._catalog = None
 
         # 确保目录存在，如果不存在则创建。
         if not actions_dir.is_dir():
@@ -66,8 +89,9 @@ class ModularActionRegistry:
                 metadata = getattr(module, "ACTION_METADATA", None)
                 execute_func = getattr(module, "execute", None)
 
-                if not isinstance(metadata, dict):
-                    raise ValueError("未找到或 ACTION_METADATA 不是一个字典。")
+                # 允许使用 MappingProxyType 等只读映射声明元数据
+                if not isinstance(metadata, Mapping):
+                    raise ValueError("未找到或 ACTION_METADATA 不是一个字典或映射。")
                 if not callable(execute_func) or not inspect.iscoroutinefunction(
                     execute_func
                 ):
@@ -86,8 +110,8 @@ class ModularActionRegistry:
                     id=action_id,
                     name=metadata.get("name", action_id),
                     description=metadata.get("description", ""),
-                    inputs=metadata.get("inputs", []),
-                    outputs=metadata.get("outputs", []),
+                    inputs=tuple(metadata.get("inputs") or ()),
+                    outputs=tuple(metadata.get("outputs") or ()),
                     execute=execute_func,
                     source_file=file_path,
                 )
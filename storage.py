@@ -1,18 +1,28 @@
 import asyncio
 import json
 import os
+import sys
 import uuid
 from datetime import datetime
 from dataclasses import dataclass, field, asdict
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# 渲染热路径上频繁读取的定义类使用 __slots__，减少实例内存并加快属性访问；
+# dataclass 的 slots 参数需要 Python 3.10+，更早的版本退回普通 dataclass
+_SLOTS: Dict[str, bool] = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+def _intern_id(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
 
 
 def _generate_id(prefix: str) -> str:
     return f"{prefix}_{uuid.uuid4().hex[:8]}"
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class LayoutConfig:
     """按钮在网格布局中的位置和尺寸信息。"""
 
@@ -94,7 +104,7 @@ class WebAppDefinition:
         }
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ButtonDefinition:
     """定义一个具体的按钮，包括其文本、类型、负载和布局。"""
 
@@ -142,7 +152,7 @@ class ButtonDefinition:
         return data
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class MenuDefinition:
     """定义一个菜单，它包含一组按钮项和可选的标题。"""
 
@@ -324,10 +334,85 @@ class ButtonsModel:
     actions: Dict[str, ActionDefinition] = field(default_factory=dict)
     web_apps: Dict[str, WebAppDefinition] = field(default_factory=dict)
     workflows: Dict[str, WorkflowDefinition] = field(default_factory=dict)
+    # ButtonStore 为共享只读快照写入的修订号；可修改的副本与来源未知的模型为 None，不可用于缓存
+    revision: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+    # 按钮 ID -> 所属菜单的反向索引，首次查询时构建
+    _button_menu_index: Optional[Dict[str, MenuDefinition]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    # 菜单 ID -> 已解析的按钮对象列表（跳过失效 ID），按菜单首次渲染时构建
+    _resolved_buttons: Dict[str, List[ButtonDefinition]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _menu_layouts: Dict[str, List[List[ButtonDefinition]]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
 
     def ensure_menu(self, menu: MenuDefinition) -> None:
         if menu.id not in self.menus:
             self.menus[menu.id] = menu
+        self.invalidate_indexes()
+
+    def invalidate_indexes(self) -> None:
+        """在菜单或按钮被就地修改后调用，丢弃已构建的派生索引。"""
+        self._button_menu_index = None
+        self._resolved_buttons.clear()
+        self._menu_layouts.clear()
+
+    def find_menu_for_button(self, button_id: str) -> Optional[MenuDefinition]:
+        """查找包含指定按钮的菜单；按钮出现在多个菜单中时返回遍历顺序中的第一个。"""
+        index = self._button_menu_index
+        if index is None:
+            index = {}
+            for menu in self.menus.values():
+                for btn_id in menu.items:
+                    index.setdefault(btn_id, menu)
+            self._button_menu_index = index
+        return index.get(button_id)
+
+    def intern_identifiers(self) -> None:
+        """
+        把按钮与菜单 ID 驻留为同一个字符串对象。克隆快照时字符串对象原样传递，
+        渲染与回调中的字典查找遇到同一对象可直接按指针判等，无需逐字符比较。
+        """
+        self.buttons = {_intern_id(btn_id): btn for btn_id, btn in self.buttons.items()}
+        for btn in self.buttons.values():
+            btn.id = _intern_id(btn.id)
+        self.menus = {_intern_id(menu_id): menu for menu_id, menu in self.menus.items()}
+        for menu in self.menus.values():
+            menu.id = _intern_id(menu.id)
+            menu.items = [_intern_id(btn_id) for btn_id in menu.items]
+
+    def resolved_buttons(self, menu: MenuDefinition) -> List[ButtonDefinition]:
+        """按菜单中的顺序返回存在的按钮对象，结果在本快照内复用。"""
+        resolved = self._resolved_buttons.get(menu.id)
+        if resolved is None:
+            buttons = self.buttons
+            resolved = [buttons[btn_id] for btn_id in menu.items if btn_id in buttons]
+            self._resolved_buttons[menu.id] = resolved
+        return resolved
+
+    def menu_layout(self, menu: MenuDefinition) -> List[List[ButtonDefinition]]:
+        """
+        按布局排好的按钮行，结果在本快照内复用。所有按钮均为默认布局时每个按钮单独成行，
+        否则按行号分组、行内按列号排序，列号相同时保持菜单中的顺序。
+        """
+        layout_rows = self._menu_layouts.get(menu.id)
+        if layout_rows is None:
+            buttons = self.resolved_buttons(menu)
+            default = LayoutConfig()
+            if all(btn.layout == default for btn in buttons):
+                layout_rows = [[btn] for btn in buttons]
+            else:
+                row_map: Dict[int, List[ButtonDefinition]] = {}
+                ordered = sorted(
+                    buttons, key=lambda btn: (btn.layout.row, btn.layout.col)
+                )
+                for btn in ordered:
+                    row_map.setdefault(btn.layout.row, []).append(btn)
+                layout_rows = list(row_map.values())
+            self._menu_layouts[menu.id] = layout_rows
+        return layout_rows
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -399,8 +484,13 @@ class ButtonStore:
         self._backup_dir = self.data_dir / "old"
         self._max_backups = 20
         self._lock = asyncio.Lock()
+        # 每次修改数据后递增，调用方可据此判断快照是否过期
+        self._revision = 0
+        # 按修订号缓存的共享快照，供只读路径复用，避免每次点击都完整克隆一遍数据
+        self._shared_snapshot: Optional[ButtonsModel] = None
         self._model = self._load()
         self._ensure_defaults()
+        self._model.intern_identifiers()
         self._backup_dir.mkdir(parents=True, exist_ok=True)
         self._save(backup=False)  # 确保启动时文件存在，但不创建备份
 
@@ -515,23 +605,69 @@ class ButtonStore:
         except Exception as exc:  # 防御性日志记录
             self._logger.error(f"保存按钮配置失败: {exc}")
 
+    def _snapshot(self, shared: bool = False) -> ButtonsModel:
+        """
+        复制当前数据，调用方需持有锁。只有共享的只读快照才标记修订号：
+        可修改的副本一旦被改动就与修订号不再对应，不能用作渲染缓存的依据。
+        """
+        snapshot = self._model.clone()
+        if shared:
+            snapshot.revision = self._revision
+        return snapshot
+
     async def get_snapshot(self) -> ButtonsModel:
         async with self._lock:
-            return self._model.clone()
+            return self._snapshot()
+
+    async def get_shared_snapshot(self) -> ButtonsModel:
+        """
+        获取当前修订号下共享的快照：同一修订号内多次调用返回同一对象，其上的派生索引也随之复用。
+        调用方只能读取，不得修改；需要修改快照时请使用 get_snapshot。
+        """
+        snapshot = self._shared_snapshot
+        if snapshot is not None and snapshot.revision == self._revision:
+            return snapshot
+        async with self._lock:
+            snapshot = self._shared_snapshot
+            if snapshot is None or snapshot.revision != self._revision:
+                snapshot = self._shared_snapshot = self._snapshot(shared=True)
+            return snapshot
+
+    async def get_snapshot_with_revision(self) -> Tuple[ButtonsModel, int]:
+        """获取快照及其对应的修订号。"""
+        async with self._lock:
+            return self._snapshot(), self._revision
+
+    async def get_snapshot_if_changed(
+        self, since_revision: int
+    ) -> Tuple[Optional[ButtonsModel], int]:
+        """
+        仅当数据在 since_revision 之后被修改过时才构建新快照。
+        未变化时返回 (None, 当前修订号)，调用方可继续使用手中的旧快照。
+        """
+        async with self._lock:
+            if self._revision == since_revision:
+                return None, self._revision
+            return self._snapshot(), self._revision
 
     async def modify(self, mutator: Callable[[ButtonsModel], None]) -> ButtonsModel:
         async with self._lock:
             mutator(self._model)
             self._ensure_defaults()
+            self._model.intern_identifiers()
+            self._model.invalidate_indexes()
+            self._revision += 1
             self._save()
-            return self._model.clone()
+            return self._snapshot()
 
     async def replace_with(self, new_data: Dict[str, Any]) -> ButtonsModel:
         async with self._lock:
             self._model = ButtonsModel.from_dict(new_data)
             self._ensure_defaults()
+            self._model.intern_identifiers()
+            self._revision += 1
             self._save()
-            return self._model.clone()
+            return self._snapshot()
 
     async def upsert_simple_button(
         self, text: str, btn_type: str, payload_value: str
@@ -1,5 +1,4 @@
 import asyncio
-import copy
 from typing import Any, Dict, List, Optional
 from pathlib import Path
 
@@ -274,7 +273,7 @@ class WebUIServer:
             {
                 "name": action.name,
                 "description": action.description,
-                "parameters": action.parameters,
+                "parameters": dict(action.parameters),
             }
             for action in actions
         ]
@@ -283,7 +282,7 @@ class WebUIServer:
     async def _handle_get_modular_actions(
         self, _request: "web.Request"
     ) -> "web.Response":
-        actions = self._modular_registry.get_all()
+        catalog = self._modular_registry.get_catalog()
         snapshot = await self._store.get_snapshot()
 
         def _build_menu_options() -> List[Dict[str, str]]:
@@ -352,34 +351,35 @@ class WebUIServer:
                 options.append({"value": workflow_id, "label": label})
             return options
 
-        dynamic_options = {
-            "menus": _build_menu_options(),
-            "buttons": _build_button_options(),
-            "web_apps": _build_web_app_options(),
-            "local_actions": _build_action_options(),
-            "workflows": _build_workflow_options(),
+        option_builders = {
+            "menus": _build_menu_options,
+            "buttons": _build_button_options,
+            "web_apps": _build_web_app_options,
+            "local_actions": _build_action_options,
+            "workflows": _build_workflow_options,
         }
+        # 动态选项只在有输入引用时才构建，每种最多构建一次
+        dynamic_options: Dict[str, List[Dict[str, str]]] = {}
 
         formatted_actions = []
-        for action in actions:
-            inputs = []
-            for input_def in action.inputs:
-                transformed = copy.deepcopy(input_def)
-                source_key = transformed.get("options_source")
-                if source_key:
-                    transformed["options"] = dynamic_options.get(source_key, [])
-                inputs.append(transformed)
-
-            formatted_actions.append(
-                {
-                    "id": action.id,
-                    "name": action.name,
-                    "description": action.description,
-                    "inputs": inputs,
-                    "outputs": copy.deepcopy(action.outputs),
-                    "filename": action.source_file.name,
-                }
-            )
+        for entry in catalog:
+            inputs = entry["inputs"]
+            if any(input_def.get("options_source") for input_def in inputs):
+                inputs = []
+                for input_def in entry["inputs"]:
+                    source_key = input_def.get("options_source")
+                    if source_key:
+                        if source_key not in dynamic_options:
+                            builder = option_builders.get(source_key)
+                            dynamic_options[source_key] = builder() if builder else []
+                        # 复制后再注入选项，不修改注册表缓存的目录
+                        input_def = {
+                            **input_def,
+                            "options": dynamic_options[source_key],
+                        }
+                    inputs.append(input_def)
+                entry = {**entry, "inputs": inputs}
+            formatted_actions.append(entry)
         secure_upload_enabled = bool(
             self._plugin.settings.get("secure_script_upload_password")
         )